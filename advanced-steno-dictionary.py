@@ -1,30 +1,260 @@
 #!/usr/bin/python
 
+import os
 import sys
+import signal
+import argparse
 try:
     import simplejson as json
 except ImportError:
     import json
 
-from stroke import KeyLayout
+from stroke import KeyLayout, DEFAULT_LAYOUT
 from advanced_steno_dictionary import AdvancedStenoDictionary
+from build_cache import BuildCache
+from parallel_build import add_entries_parallel
+from streaming import iter_json_object, SortedEntryWriter
+from dictionary_server import DictionaryServer, serve
+from profiler import BuildProfiler
+from binary_dictionary import write_binary_dictionary
+from sqlite_dictionary import write_sqlite_dictionary
+from mixin_library import MixinLibrary
+from watch import DictionaryWatcher
+import vectorized_expansion
+from analysis import DictionaryAnalysis
 
 
-if len(sys.argv) < 2:
-    exit()
+parser = argparse.ArgumentParser(
+    description = "Generate a JSON Plover dictionary from an advanced steno dictionary.")
+parser.add_argument("input",
+    help = "input dictionary file path")
+parser.add_argument("output", nargs = "?",
+    help = "output dictionary file path (stdout if omitted)")
+parser.add_argument("--layout", default = DEFAULT_LAYOUT,
+    help = "steno key layout, either the left, middle and right keys "
+        "separated by | or the path of a JSON layout file "
+        "(default: %(default)s)")
+parser.add_argument("--mixin-library", metavar = "PATH",
+    help = "start the build from the mixins of a library saved with "
+        "--save-mixin-library")
+parser.add_argument("--save-mixin-library", metavar = "PATH",
+    help = "save all the mixins defined by the build (e.g. of a mixin only "
+        "input shared by several dictionaries) as a library to PATH")
+parser.add_argument("--cache", metavar = "PATH",
+    help = "incremental build cache file, only entries which changed since "
+        "the last build are re-expanded")
+parser.add_argument("-j", "--jobs", metavar = "N", type = int,
+    help = "expand entries in parallel using N processes "
+        "(0 to use one per CPU)")
+parser.add_argument("--max-expansion", metavar = "N", type = int,
+    help = "report entries whose strokes need more than N stroke "
+        "sequence combinations to expand as errors")
+parser.add_argument("--analyze", metavar = "N", type = int,
+    help = "don't build the dictionary, print its projected size, the N "
+        "entries with the most stroke sequences and predicted conflicts")
+parser.add_argument("--max-output", metavar = "N", type = int,
+    help = "with --analyze, exit with status 1 if the output could have "
+        "more than N entries")
+parser.add_argument("--vectorize", action = "store_true",
+    help = "combine single stroke mixin variants with NumPy, which is "
+        "faster for entries with many variants")
+parser.add_argument("--mixin-stats", metavar = "N", type = int,
+    help = "print the N mixins with the highest build cost (variants times "
+        "entries using them) to stderr")
+parser.add_argument("--profile", metavar = "N", type = int,
+    help = "print the N most expensive entries and mixins to stderr")
+parser.add_argument("--profile-output", metavar = "PATH",
+    help = "with --profile, write the report to PATH as JSON instead")
+parser.add_argument("--binary-output", metavar = "PATH",
+    help = "also write the dictionary in the memory mappable binary format "
+        "(see binary_dictionary.py) to PATH")
+parser.add_argument("--sqlite-output", metavar = "PATH",
+    help = "also write the dictionary, with the source entry and mixins of "
+        "each entry, to the SQLite database PATH, only changed rows are "
+        "written if it already exists")
+parser.add_argument("--stream", action = "store_true",
+    help = "read the input and write the output incrementally, keeping "
+        "memory use flat for very large dictionaries")
+parser.add_argument("--stream-buffer", metavar = "N", type = int,
+    default = 100000,
+    help = "number of entries kept in memory before spilling a sorted run "
+        "to a temporary file when streaming (default: %(default)s)")
+parser.add_argument("--serve", metavar = "ADDRESS",
+    help = "keep the dictionary in memory and answer lookups on a Unix "
+        "socket path or a [host:]port TCP address, rebuilding when the "
+        "input changes")
+parser.add_argument("--watch", action = "store_true",
+    help = "keep running and rebuild the output whenever the input changes")
+args = parser.parse_args()
 
-layout = KeyLayout()
-layout.keys = "STKPWHRAO*EUFRPBLGTSDZ"
-layout.break_keys = (7, 12)
+if args.stream and args.jobs is not None:
+    parser.error("--stream can't be used with --jobs")
+if args.stream and args.binary_output is not None:
+    parser.error("--stream can't be used with --binary-output")
+if args.stream and args.sqlite_output is not None:
+    parser.error("--stream can't be used with --sqlite-output")
+if args.max_output is not None and args.analyze is None:
+    parser.error("--max-output needs --analyze")
+if args.vectorize and not vectorized_expansion.available():
+    parser.error("--vectorize needs NumPy")
+if args.watch and args.output is None:
+    parser.error("--watch needs an output file")
+if args.watch and (args.stream or args.serve is not None or args.jobs is not None):
+    parser.error("--watch can't be used with --stream, --serve or --jobs")
+if args.watch and (args.profile is not None or args.mixin_stats is not None):
+    parser.error("--watch can't be used with --profile or --mixin-stats")
+if args.serve is not None and (args.stream or args.jobs is not None):
+    parser.error("--serve can't be used with --stream or --jobs")
+if args.serve is not None and (args.output is not None
+        or args.binary_output is not None or args.sqlite_output is not None
+        or args.save_mixin_library is not None):
+    parser.error("--serve can't be used with an output file, --binary-output, "
+        "--sqlite-output or --save-mixin-library")
+if args.serve is not None and (args.profile is not None or args.mixin_stats is not None):
+    parser.error("--serve can't be used with --profile or --mixin-stats")
+if args.profile is not None and args.jobs is not None:
+    parser.error("--profile can't be used with --jobs")
 
-with open(sys.argv[1]) as data_file:
-    entries = json.load(data_file, object_pairs_hook=tuple)
+try:
+    if os.path.isfile(args.layout):
+        layout = KeyLayout.load(args.layout)
+    else:
+        layout = KeyLayout.from_string(args.layout)
+except ValueError as e:
+    parser.error(str(e))
+
+def print_mixin_statistics(dictionary, count):
+    print("variants\treferences\tmixin", file = sys.stderr)
+    for keys, mixin in dictionary.mixin_statistics()[:count]:
+        print(str(len(mixin.variants)) + "\t"
+            + str(mixin.references) + "\t"
+            + " ".join(keys), file = sys.stderr)
+
+def print_profile(profiler, count):
+    if build_cache is not None:
+        profiler.add_build_cache(build_cache.hits, build_cache.misses)
+    if args.profile_output is not None:
+        with open(args.profile_output, 'w') as profile_file:
+            json.dump(profiler.to_json(count), profile_file, indent = 2)
+    else:
+        print(profiler.report(count), file = sys.stderr)
+
+build_cache = None
+if args.cache is not None:
+    build_cache = BuildCache(layout)
+    build_cache.load(args.cache)
+
+mixin_library = None
+if args.mixin_library is not None:
+    try:
+        mixin_library = MixinLibrary.load(args.mixin_library, layout)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+if args.analyze is not None:
+    with open(args.input) as data_file:
+        analysis = DictionaryAnalysis(layout, mixin_library)
+        analysis.add_entries(iter_json_object(data_file))
+    print(analysis.report(args.analyze))
+
+    if args.max_output is not None and analysis.output_entries > args.max_output:
+        print("Output could have " + str(analysis.output_entries)
+            + " entries, more than " + str(args.max_output), file = sys.stderr)
+        sys.exit(1)
+    sys.exit()
+
+if args.serve is not None:
+    dictionary_server = DictionaryServer(
+        layout, args.input, build_cache,
+        mixin_library = mixin_library,
+        build_cache_path = args.cache,
+        max_expansion = args.max_expansion,
+        vectorized_expansion = args.vectorize)
+    # Shut down cleanly (removing the socket) when terminated
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit())
+    try:
+        serve(dictionary_server, args.serve)
+    except FileExistsError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        pass
+    sys.exit()
+
+if args.watch:
+    watcher = DictionaryWatcher(layout, args.input, args.output,
+        build_cache, args.cache, mixin_library,
+        args.max_expansion, args.vectorize,
+        binary_output_path = args.binary_output,
+        sqlite_output_path = args.sqlite_output,
+        mixin_library_output_path = args.save_mixin_library)
+    try:
+        watcher.watch()
+    except KeyboardInterrupt:
+        pass
+    sys.exit()
 
 dictionary = AdvancedStenoDictionary(layout)
-dictionary.add_entries(entries)
+if mixin_library is not None:
+    mixin_library.apply(dictionary)
+dictionary.max_expansion = args.max_expansion
+dictionary.vectorized_expansion = args.vectorize
+if args.profile is not None:
+    dictionary.profiler = BuildProfiler()
+if args.sqlite_output is not None:
+    dictionary.entry_sources = {}
+
+if args.stream:
+    with open(args.input) as data_file:
+        out_file = sys.stdout if args.output is None \
+            else open(args.output, 'w')
+        writer = SortedEntryWriter(out_file, args.stream_buffer,
+            dictionary.log_entry_conflict)
+
+        for translation_str, ss_str, key_str, simple_translation \
+                in dictionary.generate_entries(
+                    iter_json_object(data_file), build_cache):
+            writer.add(key_str, simple_translation, translation_str, ss_str)
+
+        writer.close()
+        if args.output is None:
+            out_file.write("\n")
+        else:
+            out_file.close()
+
+    if build_cache is not None:
+        build_cache.save(args.cache)
+    if args.save_mixin_library is not None:
+        MixinLibrary.from_dictionary(dictionary).save(args.save_mixin_library)
+    if args.mixin_stats is not None:
+        print_mixin_statistics(dictionary, args.mixin_stats)
+    if args.profile is not None:
+        print_profile(dictionary.profiler, args.profile)
+    sys.exit()
+
+with open(args.input) as data_file:
+    entries = json.load(data_file, object_pairs_hook=tuple)
+
+if args.jobs is not None:
+    add_entries_parallel(dictionary, entries, args.jobs or None, build_cache)
+else:
+    dictionary.add_entries(entries, build_cache)
+
+if build_cache is not None:
+    build_cache.save(args.cache)
+if args.save_mixin_library is not None:
+    MixinLibrary.from_dictionary(dictionary).save(args.save_mixin_library)
+if args.mixin_stats is not None:
+    print_mixin_statistics(dictionary, args.mixin_stats)
+if args.profile is not None:
+    print_profile(dictionary.profiler, args.profile)
+
+if args.binary_output is not None:
+    write_binary_dictionary(args.binary_output, layout, dictionary.entries)
+if args.sqlite_output is not None:
+    write_sqlite_dictionary(args.sqlite_output, dictionary)
 
-if len(sys.argv) >= 3:
-    with open(sys.argv[2], 'w') as out_file:
+if args.output is not None:
+    with open(args.output, 'w') as out_file:
         json.dump(dictionary.entries, out_file,
                   ensure_ascii = False, sort_keys = True,
                   indent = 0, separators = (',', ': '))
@@ -1,97 +1,430 @@
 import re
+import json
+import hashlib
 import logging
 
 from advanced_translation import AdvancedTranslation
-from stroke import Stroke, StrokeSequence
+from stroke import StrokeSequence, stroke_sequence_keys
 from advanced_stroke_sequence import \
     AdvancedStrokeSequence, \
-    ParseError
-from permutate import permutate_tree_indices
-from util import single_quote_str, double_quote_str, unquote_str
+    ParseError, \
+    ExpansionError, \
+    ExpansionBudget
+from permutate import iter_tree_indices
+from build_cache import BuildRecord
+from profiler import BuildProfiler
+import vectorized_expansion
+from util import single_quote_str, double_quote_str, unquote_str, LRUCache
 
 
+# Compiled stroke sequence tokenizers, keyed by layout keys
+_advanced_ss_patterns = {}
+
+# Stroke sequence tokenizer for a key layout. Keys which aren't already
+# tokens of the base pattern (e.g. lowercase or symbol keys) are matched as
+# single key references.
+def advanced_ss_pattern(key_layout):
+    pattern = _advanced_ss_patterns.get(key_layout.keys)
+
+    if pattern is None:
+        extra_keys = sorted({key for key in key_layout.keys
+            if not re.fullmatch(AdvancedStrokeSequence.base_pattern, key, re.VERBOSE)})
+
+        pattern_str = AdvancedStrokeSequence.base_pattern
+        if len(extra_keys) > 0:
+            pattern_str += r"| [" + re.escape("".join(extra_keys)) + "]"
+        pattern = re.compile(pattern_str, re.VERBOSE)
+        _advanced_ss_patterns[key_layout.keys] = pattern
+
+    return pattern
+
+# Stroke sequence strings of an entry's value, which is either a stroke
+# sequence string or a list of them, or None if it's neither.
+def entry_stroke_sequences(value):
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(ss_str, str) for ss_str in value):
+        return value
+
+    return None
+
+# Error message for entry values entry_stroke_sequences rejects.
+invalid_entry_message = "Entry value must be a stroke sequence string or a list of them"
+
 class Mixin:
+    __slots__ = ("change_side", "variants", "references", "version_hash",
+        "version_count", "version_digest", "keys_cache", "array_cache")
+
     def __init__(self, change_side = 0):
         # 0 - none
         # 1 - left
         # 2 - right
         self.change_side = change_side
 
-        self.simple_stroke_sequences = []
+        # Distinct stroke sequences in the order they were first added,
+        # keyed by their immutable form (tuple of stroke key bitmasks).
+        self.variants = {}
+
+        # Number of entries using this mixin.
+        self.references = 0
+
+        # Hash of the change side and the first version_count variants, and
+        # its hex digest (see version)
+        self.version_hash = hashlib.sha1(repr(change_side).encode())
+        self.version_count = 0
+        self.version_digest = self.version_hash.hexdigest()
+
+        # (variant count, stroke_sequence_keys()) when it was last made
+        self.keys_cache = None
+        # (variant count, variant_array()) when it was last made
+        self.array_cache = None
+
+    # Snapshot of the variants, later additions don't change it.
+    def simple_stroke_sequences(self):
+        return tuple(self.variants.values())
+
+    # Snapshot of the variants' keys (tuples of stroke key bitmasks), only
+    # made again once variants are added.
+    def stroke_sequence_keys(self):
+        if self.keys_cache is None or self.keys_cache[0] != len(self.variants):
+            self.keys_cache = (len(self.variants), tuple(self.variants))
+
+        return self.keys_cache[1]
+
+    # Changes whenever stroke sequences are added, used to check if entries
+    # built from this mixin are out of date. Only depends on the change side
+    # and the variants, and is only hashed when read, so builds which don't
+    # check versions don't pay for it.
+    @property
+    def version(self):
+        if self.version_count != len(self.variants):
+            for keys in self.stroke_sequence_keys()[self.version_count:]:
+                self.version_hash.update(repr(keys).encode())
+            self.version_count = len(self.variants)
+            self.version_digest = self.version_hash.hexdigest()
+
+        return self.version_digest
+
+    def variant_count(self):
+        return len(self.variants)
+
+    # Single stroke variants as a NumPy array of stroke key bitmasks, or None
+    # (see vectorized_expansion.single_stroke_array).
+    def variant_array(self):
+        if self.array_cache is None or self.array_cache[0] != len(self.variants):
+            self.array_cache = (len(self.variants),
+                vectorized_expansion.single_stroke_array(self.variants))
+
+        return self.array_cache[1]
 
     def add(self, stroke_sequences):
-        self.simple_stroke_sequences += stroke_sequences
+        for stroke_sequence in stroke_sequences:
+            keys = stroke_sequence.to_keys()
+            if keys not in self.variants:
+                self.variants[keys] = stroke_sequence
 
 class AdvancedStenoDictionary:
     def __init__(self, key_layout):
         self.key_layout = key_layout
         self.mixins = {}
 
-        self._add_base_mixin("", 0, 0, [StrokeSequence([Stroke(self.key_layout)])])
-        self._add_base_mixin("-", 0, 2, [StrokeSequence([Stroke(self.key_layout)])])
-        self._add_base_mixin("+", 0, 1, [StrokeSequence([Stroke(self.key_layout)])])
-        self._add_base_mixin("/", 0, 1, [StrokeSequence([Stroke(self.key_layout)]*2)])
-
-        for i in range(len(self.key_layout.keys)):
-            key = self.key_layout.keys[i]
-            if i < self.key_layout.break_keys[0]:
-                self._add_base_mixin(key, 1, 0,
-                    [StrokeSequence([Stroke(self.key_layout, key)])])
-            elif i >= self.key_layout.break_keys[1]:
-                self._add_base_mixin(key, 2, 0,
-                    [StrokeSequence([Stroke(self.key_layout, "-" + key)])])
-            else:
-                self._add_base_mixin(key, 0, 2,
-                    [StrokeSequence([Stroke(self.key_layout, key)])])
+        self._add_base_mixin("", 0, 0, [StrokeSequence.from_keys(self.key_layout, (0,))])
+        self._add_base_mixin("-", 0, 2, [StrokeSequence.from_keys(self.key_layout, (0,))])
+        self._add_base_mixin("+", 0, 1, [StrokeSequence.from_keys(self.key_layout, (0,))])
+        self._add_base_mixin("/", 0, 1, [StrokeSequence.from_keys(self.key_layout, (0, 0))])
+
+        # Keys are single key mixins, left and right keys are limited to their
+        # side and middle keys behave as dividers.
+        for side in (1, 0, 2):
+            for key, positions in self.key_layout.key_positions[side].items():
+                self._add_base_mixin(key, side, 2 if side == 0 else 0,
+                    [StrokeSequence.from_keys(self.key_layout, (1 << positions[0],))])
 
-        self.advanced_ss_pattern = re.compile(
-            AdvancedStrokeSequence.base_pattern \
-                + r"| [" + re.escape("".join(self.key_layout.keys)) + "]"
-            , re.VERBOSE)
+        self.advanced_ss_pattern = advanced_ss_pattern(self.key_layout)
 
         self.entries = {}
 
-    def add_entries(self, entries):
-        for translation_str, ss_strs in entries:
-            translation = AdvancedTranslation(translation_str)
+        # (stroke sequence string, translation string if the stroke
+        # sequence has option groups) -> (AdvancedStrokeSequence,
+        # [(mixin key, mixin)])
+        self.parse_cache = LRUCache(1 << 14)
+
+        # Prefix of (action, mixin, mixin version) of stroke sequence parts
+        # -> expansion of the prefix (see
+        # AdvancedStrokeSequence._expand_prefix), or None to not cache them.
+        # Limited by the total number of partial sequences cached.
+        self.expansion_cache = LRUCache(1 << 16,
+            lambda expansion: len(expansion[1]))
+
+        # Maximum number of stroke sequence combinations made while
+        # expanding a source entry (all its stroke sequences and
+        # translation permutations), or None for no limit.
+        self.max_expansion = None
+
+        # Whether to combine the single stroke variants of mixins with NumPy
+        # (see vectorized_expansion), only used if NumPy is available.
+        self.vectorized_expansion = False
+
+        # BuildProfiler collecting build costs, or None
+        self.profiler = None
+
+        # StrokeTrie index of entries, updated as entries are added (or
+        # generated), or None to not index them. Set to an empty StrokeTrie
+        # before adding entries for prefix lookups.
+        self.stroke_trie = None
+
+        # key_str -> (translation_str, ss_str) of the source entry each entry
+        # was built from, or None to not record them
+        self.entry_sources = None
 
-            permutations = permutate_tree_indices(translation)
-            if len(permutations) == 0:
-                permutations = [()]
+    # If build_cache is given, entries which haven't changed and whose
+    # mixins haven't changed since they were cached are not re-expanded.
+    def add_entries(self, entries, build_cache = None):
+        for index, (translation_str, ss_strs) in enumerate(entries):
+            ss_strs = [ss_strs] if isinstance(ss_strs, str) else ss_strs
+
+            if build_cache is None:
+                self.add_entry(translation_str, ss_strs, index = index)
+                continue
 
+            record = build_cache.lookup(self, translation_str, ss_strs)
+            if record is not None:
+                record.replay(self, translation_str)
+            else:
+                record = BuildRecord()
+                if self.add_entry(translation_str, ss_strs, record, index = index):
+                    build_cache.store(translation_str, ss_strs, record)
+
+    # Like add_entries, but instead of adding them to entries, yields
+    # (translation_str, ss_str, key_str, simple_translation) for every
+    # dictionary entry as each source entry is processed. Mixins are still
+    # added and errors are still logged.
+    def generate_entries(self, entries, build_cache = None):
+        for index, (translation_str, ss_strs) in enumerate(entries):
             ss_strs = [ss_strs] if isinstance(ss_strs, str) else ss_strs
-            for ss_str in ss_strs:
-                try:
-                    ss = AdvancedStrokeSequence(self, ss_str, translation)
 
-                    for indices in permutations:
-                        simple_translation = translation.lookup(indices)
-                        simple_stroke_sequences = ss.to_simple_stroke_sequences(indices)
+            record = None
+            if build_cache is not None:
+                record = build_cache.lookup(self, translation_str, ss_strs)
+
+            if record is not None:
+                record.replay(self, translation_str, entries = False)
+            else:
+                record = BuildRecord()
+                if self.add_entry(translation_str, ss_strs, record,
+                            deferred = True, index = index) \
+                        and build_cache is not None:
+                    build_cache.store(translation_str, ss_strs, record)
+
+            record.add_references(self)
+            for output in record.outputs:
+                if output[0] == "e":
+                    if self.stroke_trie is not None:
+                        self.stroke_trie.add(
+                            stroke_sequence_keys(self.key_layout, output[2]),
+                            output[3])
+                    yield (translation_str, output[1], output[2], output[3])
+                elif output[0] == "x":
+                    self.log_entry_error(translation_str, output[1], output[2])
+
+    # Returns False if any of the entry's stroke sequences couldn't be
+    # processed.
+    # If deferred, mixins are still added immediately but entries and errors
+    # are only written to record, to be replayed later.
+    # index is the entry's position in the source, used by the profiler.
+    def add_entry(self, translation_str, ss_strs, record = None, deferred = False,
+            index = None):
+        value = ss_strs
+        ss_strs = entry_stroke_sequences(value)
+        if ss_strs is None:
+            ss_str = json.dumps(value, ensure_ascii = False)
+            if deferred:
+                record.add_error(ss_str, invalid_entry_message)
+            else:
+                self.log_entry_error(translation_str, ss_str, invalid_entry_message)
+            return False
 
-                        if translation.is_mixin:
-                            self.add_mixin(
+        if self.profiler is None:
+            return self._add_entry(translation_str, ss_strs, record, deferred)
+
+        self.profiler.begin_entry(index, translation_str)
+        try:
+            return self._add_entry(translation_str, ss_strs, record, deferred)
+        finally:
+            self.profiler.end_entry()
+
+    def _add_entry(self, translation_str, ss_strs, record, deferred):
+        profiler = self.profiler
+        if profiler is not None:
+            start = BuildProfiler.clock()
+
+        translation = AdvancedTranslation(translation_str)
+
+        if profiler is not None:
+            profiler.add_translation_parse(BuildProfiler.clock() - start)
+
+        success = True
+        used_mixins = set()
+        # max_expansion limits the entry as a whole
+        budget = ExpansionBudget(self.max_expansion)
+        for ss_str in ss_strs:
+            try:
+                ss = self.parse_stroke_sequence(ss_str, translation)
+                ss_mixins = {mixin for key, mixin in ss.dependencies()}
+                used_mixins |= ss_mixins
+                if record is not None:
+                    record.add_dependencies(ss)
+
+                # Stroke sequences are only expanded once for each distinct
+                # selection of the option groups they're bound to.
+                # Expansions are discarded if this entry changes a mixin
+                # they use.
+                bound_indices = ss.bound_indices()
+                expansions = {}
+                expansions_state = None
+
+                permutations = iter_tree_indices(translation) if profiler is None \
+                    else profiler.iter_tree_indices(translation)
+                for indices in permutations:
+                    if profiler is not None:
+                        start = BuildProfiler.clock()
+
+                    simple_translation = translation.lookup(indices)
+
+                    if profiler is not None:
+                        profiler.add_permutation(BuildProfiler.clock() - start)
+
+                    state = [len(mixin.variants) for mixin in ss_mixins]
+                    if state != expansions_state:
+                        expansions = {}
+                        expansions_state = state
+
+                    binding = ss.binding(indices, bound_indices)
+                    expansion = expansions.get(binding)
+                    if expansion is None:
+                        expansion = ss.to_simple_stroke_sequences(indices, budget)
+                        expansion = (expansion,
+                            [simple_stroke_sequence.to_string()
+                                for simple_stroke_sequence in expansion]
+                            if translation.is_entry else None)
+                        expansions[binding] = expansion
+                    simple_stroke_sequences, key_strs = expansion
+
+                    if translation.is_mixin:
+                        self.add_mixin(
+                            simple_translation,
+                            translation.mixin_side,
+                            translation.change_side,
+                            simple_stroke_sequences)
+                        if record is not None:
+                            record.add_mixin(
                                 simple_translation,
                                 translation.mixin_side,
                                 translation.change_side,
                                 simple_stroke_sequences)
 
-                        if translation.is_entry:
-                            for simple_stroke_sequence in simple_stroke_sequences:
-                                key_str = simple_stroke_sequence.to_string()
+                    if translation.is_entry:
+                        for simple_stroke_sequence, key_str \
+                                in zip(simple_stroke_sequences, key_strs):
+                            if not deferred:
+                                self.add_entry_output(
+                                    translation_str,
+                                    ss_str,
+                                    key_str,
+                                    simple_translation,
+                                    simple_stroke_sequence.to_keys())
+                            if record is not None:
+                                record.add_entry(
+                                    ss_str, key_str, simple_translation)
+            except(ParseError, LookupError, ExpansionError) as e:
+                if deferred:
+                    record.add_error(ss_str, str(e))
+                else:
+                    self.log_entry_error(translation_str, ss_str, str(e))
+                success = False
+
+        if record is not None:
+            record.expansion = budget.spent
+        if not deferred:
+            self.add_references(used_mixins)
+
+        return success
+
+    def add_references(self, mixins):
+        for mixin in mixins:
+            mixin.references += 1
+
+    def log_entry_error(self, translation_str, ss_str, message):
+        logging.warning("Error processing entry: {\""
+            + translation_str + "\": \""
+            + ss_str + "\"}")
+        logging.warning("  " + message)
+
+    # Parsed stroke sequences are cached and shared between entries, a cached
+    # stroke sequence is reparsed if any of the mixin keys it uses now refer
+    # to a different mixin. The returned stroke sequence must not be changed.
+    def parse_stroke_sequence(self, ss_str, translation):
+        # Translation options are only used to fill in empty stroke
+        # sequence options.
+        cache_key = (ss_str, translation.str_ if "[" in ss_str else None)
+
+        cached = self.parse_cache.get(cache_key)
+        if cached is not None:
+            ss, dependencies = cached
+            for key, mixin in dependencies:
+                if self.mixins.get(key) is not mixin:
+                    break
+            else:
+                return ss
+
+        if self.profiler is not None:
+            start = BuildProfiler.clock()
+
+        ss = AdvancedStrokeSequence(self, ss_str, translation)
+
+        if self.profiler is not None:
+            self.profiler.add_parse(BuildProfiler.clock() - start)
+
+        self.parse_cache[cache_key] = (ss, list(ss.dependencies()))
+
+        return ss
+
+    # Returns the keys of the distinct mixins used by a source stroke sequence,
+    # in the order they are used.
+    def stroke_sequence_mixin_keys(self, translation_str, ss_str):
+        ss = self.parse_stroke_sequence(ss_str, AdvancedTranslation(translation_str))
+
+        keys = []
+        mixins = set()
+        for key, mixin in ss.dependencies():
+            if mixin not in mixins:
+                mixins.add(mixin)
+                keys.append(key)
+
+        return keys
 
-                                if key_str in self.entries:
-                                    logging.warning("Conflict detected with entry: {\""
-                                        + translation_str + "\": \""
-                                        + ss_str + "\"} and: {\""
-                                        + self.entries[key_str] + "\": \""
-                                        + key_str + "\"}")
+    # keys - stroke key bitmasks of key_str, parsed from key_str if needed and
+    # not given
+    def add_entry_output(self, translation_str, ss_str, key_str, simple_translation,
+            keys = None):
+        if key_str in self.entries:
+            self.log_entry_conflict(
+                translation_str, ss_str, key_str, self.entries[key_str])
 
-                                self.entries[key_str] = simple_translation
-                except(ParseError, LookupError) as e:
-                    logging.warning("Error processing entry: {\""
-                        + translation_str + "\": \""
-                        + ss_str + "\"}")
-                    logging.warning("  " + str(e))
+        self.entries[key_str] = simple_translation
+        if self.entry_sources is not None:
+            self.entry_sources[key_str] = (translation_str, ss_str)
+        if self.stroke_trie is not None:
+            if keys is None:
+                keys = stroke_sequence_keys(self.key_layout, key_str)
+            self.stroke_trie.add(keys, simple_translation)
+
+    def log_entry_conflict(self, translation_str, ss_str, key_str, existing_translation):
+        logging.warning("Conflict detected with entry: {\""
+            + translation_str + "\": \""
+            + ss_str + "\"} and: {\""
+            + existing_translation + "\": \""
+            + key_str + "\"}")
 
     def add_mixin(self, key, side, change_side, entries):
         if side == 0:
@@ -99,6 +432,9 @@ class AdvancedStenoDictionary:
             self.add_mixin(key, 2, change_side, entries)
             return
 
+        if self.profiler is not None:
+            start = BuildProfiler.clock()
+
         key_ = ("-" if side == 2 else "") + double_quote_str(key)
         if key_ in self.mixins:
             mixin = self.mixins[key_]
@@ -107,7 +443,7 @@ class AdvancedStenoDictionary:
             else:
                 logging.warning("Mixin " + keys[0] + " definition differs from existing meta data.")
         else:
-            mixin = Mixin(change_side)
+            mixin = self.new_mixin(change_side)
             mixin.add(entries)
             self.mixins[key_] = mixin
 
@@ -116,6 +452,27 @@ class AdvancedStenoDictionary:
             if re.match(r"[a-zA-Z][a-zA-Z ]*$", key):
                 self.mixins[("-" if side == 2 else "") + key.lower().replace(" ", "_")] = mixin
 
+        if self.profiler is not None:
+            self.profiler.add_mixin(
+                key_, BuildProfiler.clock() - start, len(entries))
+
+    def new_mixin(self, change_side):
+        return Mixin(change_side)
+
+    # Returns a list of ([keys], mixin) for each distinct mixin, sorted by
+    # decreasing build cost (number of variants times number of entries
+    # using it).
+    def mixin_statistics(self):
+        keys = {}
+        for key, mixin in self.mixins.items():
+            keys.setdefault(id(mixin), ([], mixin))[0].append(key)
+
+        return sorted(keys.values(),
+            key = lambda item: (
+                -len(item[1].variants) * item[1].references,
+                -len(item[1].variants),
+                item[0][0]))
+
     def _add_base_mixin(self, key, side, change_side, simple_stroke_sequences):
         mixin = Mixin(change_side)
         mixin.add(simple_stroke_sequences)
@@ -130,7 +487,7 @@ class AdvancedStenoDictionary:
             self.mixins["-" + simplified_key] = mixin
             self.mixins["-" + long_key] = mixin
 
-    def mixin(self, key, side):
+    def mixin_key(self, key, side):
         key_ = key;
         if len(key) > 0:
             if key[0] == "'":
@@ -138,7 +495,10 @@ class AdvancedStenoDictionary:
             elif key[0] != "\"":
                 key_ = key.lower()
 
-        key_ = ("-" if side == 2 else "") + key_
+        return ("-" if side == 2 else "") + key_
+
+    def mixin(self, key, side):
+        key_ = self.mixin_key(key, side)
 
         if not key_ in self.mixins:
             raise LookupError("Mixin " + key_ + " does not exist.")
@@ -1,7 +1,4 @@
-import re
-import copy
-
-from stroke import Stroke, StrokeSequence
+from stroke import StrokeSequence
 from permutate import \
     PartsList, \
     OptionGroup, \
@@ -9,17 +6,32 @@ from permutate import \
     OptionGroupStack, \
     permutate_tree_indices
 from util import double_quote_str
+import vectorized_expansion
 
 
 class AdvancedStrokeSequencePart:
+    __slots__ = ("mixin_key", "mixin", "action")
+
     def __init__(self, dictionary, name, side, action):
+        self.mixin_key = dictionary.mixin_key(name, side)
         self.mixin = dictionary.mixin(name, side)
         self.action = action
 
-    def to_simple_stroke_sequences(self, selection_tree):
-        return self.mixin.simple_stroke_sequences
+    def dependencies(self):
+        yield (self.mixin_key, self.mixin)
+
+    def to_simple_stroke_sequence_keys(self, selection_tree):
+        return self.mixin.stroke_sequence_keys()
+
+    def to_simple_stroke_sequence_array(self, selection_tree):
+        return self.mixin.variant_array()
+
+    def variant_count(self, selection_tree):
+        return self.mixin.variant_count()
 
 class AdvancedStrokeSequenceExpandedOptionGroup(OptionGroup):
+    __slots__ = ("options",)
+
     def __init__(self, options):
         self.options = options
 
@@ -29,10 +41,31 @@ class AdvancedStrokeSequenceExpandedOptionGroup(OptionGroup):
     def __getitem__(self, i):
         return self.options[i]
 
-    def to_simple_stroke_sequences(self, selection_tree = []):
-        return self.options[selection_tree].to_simple_stroke_sequences(selection_tree)
+    def dependencies(self):
+        for option in self.options.values():
+            yield from option.dependencies()
+
+    def to_simple_stroke_sequence_keys(self, selection_tree = []):
+        return self.options[selection_tree].to_simple_stroke_sequence_keys(selection_tree)
+
+    def to_simple_stroke_sequence_array(self, selection_tree = []):
+        return self.options[selection_tree].to_simple_stroke_sequence_array(selection_tree)
+
+    def variant_count(self, selection_tree = []):
+        return self.options[selection_tree].variant_count(selection_tree)
 
 class AdvancedStrokeSequenceOptionGroup(BuildableOptionGroup):
+    __slots__ = (
+        "dictionary",
+        "start_side",
+        "option_i",
+        "action",
+        "bound_index",
+        "sub_option_group_i",
+        "fill_in_options",
+        "inner_side",
+        "inner_action")
+
     def __init__(self,
         dictionary,
         side,
@@ -84,18 +117,9 @@ class AdvancedStrokeSequenceOptionGroup(BuildableOptionGroup):
         self.options = [fill_in_option(i)
             for i in range(0, len(self.fill_in_options))]
 
-    def to_simple_stroke_sequences(self, selection_tree):
-        selection_indices = None
-        if len(selection_tree) > 0:
-            selection_indices = selection_tree[self.bound_index]
-            if isinstance(selection_indices, int):
-                selection_indices = (selection_indices, ())
-        else:
-            selection_indices = (0, ())
-
-        return self.options[selection_indices[0]] \
-            .to_simple_stroke_sequences(
-                selection_indices[1])
+    def dependencies(self):
+        for option in self.options:
+            yield from option.dependencies()
 
 class AdvancedStrokeSequenceOptionGroupStack(OptionGroupStack):
     def __init__(self, dictionary, fill_in_options):
@@ -118,10 +142,146 @@ class AdvancedStrokeSequenceOptionGroupStack(OptionGroupStack):
         super().end_group()
 
 
+# Flat form of a stroke sequence's parts, compiled once and evaluated for
+# each selection tree (translation permutation).
+#
+# instructions is a tuple of (operand id, action, slot). If slot is -1 the
+# operand is a mixin, otherwise it's a tuple of the options of an option
+# group bound to the translation option group at index slot. Options
+# (stroke sequences, mixin parts and expanded option groups) give their
+# variants with to_simple_stroke_sequence_keys(sub selection tree).
+class StrokeSequenceProgram:
+    __slots__ = ("instructions", "operands", "mixin_keys", "mixin_prefix")
+
+    def __init__(self, parts):
+        instructions = []
+        self.operands = []
+        # Mixin key of each instruction, or None for option groups
+        self.mixin_keys = []
+
+        for part in parts:
+            if isinstance(part, AdvancedStrokeSequencePart):
+                instructions.append((len(self.operands), part.action, -1))
+                self.operands.append(part.mixin)
+                self.mixin_keys.append(part.mixin_key)
+            else:
+                instructions.append(
+                    (len(self.operands), part.action, part.bound_index))
+                self.operands.append(tuple(part.options))
+                self.mixin_keys.append(None)
+
+        self.instructions = tuple(instructions)
+
+        # Number of leading mixin instructions
+        self.mixin_prefix = 0
+        for operand_id, action, slot in self.instructions:
+            if slot >= 0:
+                break
+            self.mixin_prefix += 1
+
+    def __len__(self):
+        return len(self.instructions)
+
+    # Returns [(action, variants keys)] for each instruction.
+    def run(self, selection_tree):
+        operands = self.operands
+        parts = []
+        for operand_id, action, slot in self.instructions:
+            if slot < 0:
+                parts.append((action, operands[operand_id].stroke_sequence_keys()))
+                continue
+
+            choice = selection_tree[slot] if len(selection_tree) > 0 else 0
+            if choice.__class__ is int:
+                option = operands[operand_id][choice]
+                choice = ()
+            else:
+                option = operands[operand_id][choice[0]]
+                choice = choice[1]
+            parts.append((action, option.to_simple_stroke_sequence_keys(choice)))
+
+        return parts
+
+    # Returns (option, sub selection tree) of an option group instruction.
+    def _selected_option(self, operand_id, slot, selection_tree):
+        choice = selection_tree[slot] if len(selection_tree) > 0 else 0
+        if choice.__class__ is int:
+            return self.operands[operand_id][choice], ()
+
+        return self.operands[operand_id][choice[0]], choice[1]
+
+    # Returns [(action, variants array)] for each instruction, or None if any
+    # variants aren't all single strokes (see vectorized_expansion).
+    def run_arrays(self, selection_tree):
+        parts = []
+        for operand_id, action, slot in self.instructions:
+            if slot < 0:
+                array = self.operands[operand_id].variant_array()
+            else:
+                option, choice = self._selected_option(
+                    operand_id, slot, selection_tree)
+                array = option.to_simple_stroke_sequence_array(choice)
+
+            if array is None:
+                return None
+            parts.append((action, array))
+
+        return parts
+
+    # Number of combinations of the instructions' variants, the number of
+    # stroke sequences the expansion makes unless some combinations are the
+    # same.
+    def count(self, selection_tree):
+        count = 1
+        for operand_id, action, slot in self.instructions:
+            if slot < 0:
+                count *= self.operands[operand_id].variant_count()
+            else:
+                option, choice = self._selected_option(
+                    operand_id, slot, selection_tree)
+                count *= option.variant_count(choice)
+
+        return count
+
+# Mixin prefixes with fewer combinations than this (the product of the
+# number of variants of each mixin) are faster to expand again than to look
+# up in the expansion cache.
+min_cached_combinations = 16
+
 class ParseError(Exception):
     pass
 
+class ExpansionError(Exception):
+    pass
+
+# Number of stroke sequence combinations (including partial combinations)
+# made so far while expanding a source entry, shared by all the expansions of
+# the entry so limit applies to the entry as a whole. A limit of None is no
+# limit.
+class ExpansionBudget:
+    __slots__ = ("limit", "spent")
+
+    def __init__(self, limit = None):
+        self.limit = limit
+        self.spent = 0
+
+    # Combinations left, or None for no limit.
+    def remaining(self):
+        if self.limit is None:
+            return None
+
+        return self.limit - self.spent
+
+    # Raises ExpansionError if expansion_count more combinations would exceed
+    # the limit.
+    def check(self, expansion_count):
+        if self.limit is not None and self.spent + expansion_count > self.limit:
+            raise ExpansionError("Expansion exceeds "
+                + str(self.limit) + " stroke sequence combinations")
+
 class AdvancedStrokeSequence(PartsList):
+    __slots__ = ("dictionary", "str_", "fill_in_options", "parts", "_program")
+
     base_pattern = r"""
         \s+                                               # Whitespace (ignored outside of quotes)
         | [*/+\-&\^\],]                                   # Special single characters
@@ -135,6 +295,7 @@ class AdvancedStrokeSequence(PartsList):
         self.dictionary = dictionary
         self.str_ = advanced_ss_str
         self.fill_in_options = fill_in_options
+        self._program = None
 
         if self.str_ == "":
             self.parts = []
@@ -187,7 +348,7 @@ class AdvancedStrokeSequence(PartsList):
                 if part.mixin.change_side > 0:
                     option_group_stack[-1].inner_side = part.mixin.change_side
 
-        self.parts = option_group_stack.root().parts
+        self.parts = tuple(option_group_stack.root().parts)
 
     def __len__(self):
         return len(self.parts)
@@ -198,14 +359,215 @@ class AdvancedStrokeSequence(PartsList):
     def add_part(self, part):
         self.parts.append(part)
 
-    def to_simple_stroke_sequences(self, selection_tree = []):
-        simple_stroke_sequences = [StrokeSequence(
-            [Stroke(self.dictionary.key_layout)])]
+    # Indices of the translation option groups the stroke sequence's option
+    # groups are bound to, only these affect its expansion.
+    def bound_indices(self):
+        return sorted({part.bound_index for part in self.parts
+            if isinstance(part, AdvancedStrokeSequenceOptionGroup)})
+
+    # The part of a selection tree which affects the expansion, selection
+    # trees with the same binding expand to the same stroke sequences.
+    def binding(self, selection_tree, bound_indices = None):
+        if len(selection_tree) == 0:
+            return ()
+        if bound_indices is None:
+            bound_indices = self.bound_indices()
 
+        return tuple(selection_tree[i] for i in bound_indices)
+
+    # Yields (mixin key, mixin) pairs for every mixin referenced.
+    def dependencies(self):
         for part in self.parts:
-            simple_stroke_sequences = [ss_a.copy().combine(ss_b, part.action)
-                for ss_b in part.to_simple_stroke_sequences(
-                    selection_tree)
-                for ss_a in simple_stroke_sequences]
+            yield from part.dependencies()
+
+    # Lazily yields the distinct stroke sequences (as tuples of stroke key
+    # bitmasks) of the cartesian product of the parts.
+    #
+    # The product is expanded depth first, each partial sequence is only
+    # combined once with the following parts and identical partial sequences
+    # are only expanded once. The leading mixin parts are expanded with
+    # _expand_prefix, which shares their expansion between stroke sequences.
+    # Raises ExpansionError if the combinations (partial sequences) made
+    # exceed budget, an ExpansionBudget which the combinations are added to
+    # once the expansion is finished. Without a budget the expansion is
+    # limited to dictionary.max_expansion combinations.
+    #
+    # If dictionary.vectorized_expansion is set and every part only has
+    # single stroke variants, the parts are combined with NumPy instead, in
+    # the same order.
+    def iter_simple_stroke_sequence_keys(self, selection_tree = [], budget = None):
+        if budget is None:
+            budget = ExpansionBudget(self.dictionary.max_expansion)
+        check = budget.check
+
+        program = self.program()
+
+        if self.dictionary.vectorized_expansion:
+            parts = self._single_stroke_arrays(program, selection_tree)
+            if parts is not None:
+                level_sizes = []
+                yield from vectorized_expansion.iter_single_stroke_sequence_keys(
+                    parts, level_sizes, check, budget.remaining())
+                budget.spent += sum(level_sizes)
+                self._profile_expansion(program, level_sizes)
+                return
+
+        parts = program.run(selection_tree)
+        prefix_length, prefix_sizes, prefix = self._expand_prefix(
+            program, parts, check)
+        seen = [set() for part in parts[prefix_length:]]
+        expansion_count = sum(prefix_sizes)
+
+        def expand(i, keys):
+            nonlocal expansion_count
+
+            if i == len(parts):
+                yield keys
+                return
+
+            action, part_keys = parts[i]
+            part_seen = seen[i - prefix_length]
+            for keys_b in part_keys:
+                if action == 0:
+                    combined = keys[:-1] + (keys[-1] | keys_b[0],) + keys_b[1:]
+                else:
+                    combined = keys[:-1] + (keys[-1] & ~keys_b[0],) + keys_b[1:]
+
+                if combined in part_seen:
+                    continue
+                part_seen.add(combined)
+
+                expansion_count += 1
+                check(expansion_count)
+
+                yield from expand(i + 1, combined)
+
+        for keys in prefix:
+            yield from expand(prefix_length, keys)
+
+        budget.spent += expansion_count
+        self._profile_expansion(program,
+            list(prefix_sizes) + [len(part_seen) for part_seen in seen])
+
+    # Expands the leading mixin parts breadth first, which gives the same
+    # distinct partial sequences in the same order as the depth first
+    # expansion. The partial sequences of each prefix of at least two mixin
+    # parts are kept in dictionary.expansion_cache, keyed by the action,
+    # mixin and mixin version of each part, so stroke sequences starting with
+    # the same mixins only expand them once. Adding variants to a mixin
+    # changes its version, so prefixes using it are expanded again.
+    #
+    # Returns (number of parts expanded, number of distinct partial sequences
+    # after each part, the distinct partial sequences).
+    def _expand_prefix(self, program, parts, check):
+        cache = self.dictionary.expansion_cache
+        if cache is None or program.mixin_prefix < 2:
+            return 0, (), ((0,),)
+
+        combinations = 1
+        for action, part_keys in parts[:program.mixin_prefix]:
+            combinations *= len(part_keys)
+        if combinations < min_cached_combinations:
+            return 0, (), ((0,),)
+
+        cache_keys = []
+        cache_key = ()
+        for operand_id, action, slot in program.instructions[:program.mixin_prefix]:
+            mixin = program.operands[operand_id]
+            cache_key += ((action, mixin, mixin.version),)
+            cache_keys.append(cache_key)
+
+        # Continue from the longest prefix already expanded
+        start = 0
+        level_sizes = ()
+        level = ((0,),)
+        for i in range(len(cache_keys) - 1, 0, -1):
+            cached = cache.get(cache_keys[i])
+            if cached is not None:
+                start = i + 1
+                level_sizes, level = cached
+                check(sum(level_sizes))
+                break
+
+        expansion_count = sum(level_sizes)
+        for i in range(start, len(cache_keys)):
+            action, part_keys = parts[i]
+            combined = {}
+            for keys in level:
+                for keys_b in part_keys:
+                    if action == 0:
+                        combined[keys[:-1] + (keys[-1] | keys_b[0],) + keys_b[1:]] = None
+                    else:
+                        combined[keys[:-1] + (keys[-1] & ~keys_b[0],) + keys_b[1:]] = None
+                # Stop as soon as the budget is exceeded, not after making
+                # the whole level
+                check(expansion_count + len(combined))
+            level = tuple(combined)
+            level_sizes += (len(level),)
+            expansion_count += len(level)
+
+            if i > 0:
+                cache[cache_keys[i]] = (level_sizes, level)
+
+        return len(cache_keys), level_sizes, level
+
+    # Compiled on first use, the parts must not change afterwards.
+    def program(self):
+        if self._program is None:
+            self._program = StrokeSequenceProgram(self.parts)
+
+        return self._program
+
+    # [(action, single stroke variants array)] for each part, or None if
+    # they can't be (or aren't worth) combined with vectorized_expansion.
+    def _single_stroke_arrays(self, program, selection_tree):
+        if len(program) == 0 or len(self.dictionary.key_layout.keys) > 64:
+            return None
+
+        parts = program.run_arrays(selection_tree)
+        if parts is None:
+            return None
+
+        combinations = 1
+        for action, array in parts:
+            combinations *= len(array)
+        if combinations < vectorized_expansion.min_combinations:
+            return None
+
+        return parts
+
+    # level_sizes - Number of distinct partial sequences after each part.
+    def _profile_expansion(self, program, level_sizes):
+        profiler = self.dictionary.profiler
+        if profiler is not None:
+            profiler.add_combinations(sum(level_sizes))
+            for mixin_key, level_size in zip(program.mixin_keys, level_sizes):
+                if mixin_key is not None:
+                    profiler.add_mixin_combinations(mixin_key, level_size)
+
+    # Upper bound of the number of stroke sequences the expansion makes, see
+    # StrokeSequenceProgram.count.
+    def variant_count(self, selection_tree = []):
+        return self.program().count(selection_tree)
+
+    def to_simple_stroke_sequence_array(self, selection_tree = [], budget = None):
+        return vectorized_expansion.single_stroke_array(
+            self.iter_simple_stroke_sequence_keys(selection_tree, budget))
+
+    def to_simple_stroke_sequence_keys(self, selection_tree = [], budget = None):
+        return list(self.iter_simple_stroke_sequence_keys(selection_tree, budget))
+
+    def to_simple_stroke_sequences(self, selection_tree = [], budget = None):
+        key_layout = self.dictionary.key_layout
+        profiler = self.dictionary.profiler
+        if profiler is not None:
+            start = profiler.clock()
+
+        simple_stroke_sequences = [StrokeSequence.from_keys(key_layout, keys)
+            for keys in self.iter_simple_stroke_sequence_keys(selection_tree, budget)]
+
+        if profiler is not None:
+            profiler.add_expansion(
+                profiler.clock() - start, len(simple_stroke_sequences))
 
         return simple_stroke_sequences
@@ -1,4 +1,6 @@
 import re
+import itertools
+
 from permutate import PartsList, BuildableOptionGroup, OptionGroupStack
 
 
@@ -10,9 +12,18 @@ class AdvancedTranslation(PartsList):
         """,
         re.VERBOSE)
 
+    # Translations with more permutations than this are rendered on each
+    # lookup instead of being stored in a table.
+    max_table_size = 1 << 16
+
     def __init__(self, translation_str):
         self.str_ = translation_str
 
+        # Compiled form, see _compile.
+        self._template = None
+        self._variant_count = None
+        self._variants = None
+
         meta_entry = ""
         meta_divider = self.str_.rfind("|")
         translation = self.str_
@@ -36,7 +47,7 @@ class AdvancedTranslation(PartsList):
         part_strs = AdvancedTranslation.translation_pattern.findall(translation)
 
         option_group_stack = OptionGroupStack(
-            BuildableOptionGroup(AdvancedTranslation("")))
+            lambda: BuildableOptionGroup(lambda: AdvancedTranslation("")))
         for part_str in part_strs:
             if part_str == "[":
                 option_group_stack.begin_group()
@@ -58,18 +69,84 @@ class AdvancedTranslation(PartsList):
     def add_part(self, part):
         self.parts.append(part)
 
-    def lookup(self, choice_tree):
-        value = ""
-        i = 0
+    # Flattens the translation into a template of literal strings and option
+    # groups (slots), adjacent literals are joined.
+    def _compile(self):
+        self._template = []
+        self._variant_count = 1
         for part in self.parts:
             if isinstance(part, BuildableOptionGroup):
+                self._template.append(part)
+                self._variant_count *= sum(
+                    option.variant_count() for option in part)
+            elif len(self._template) > 0 and isinstance(self._template[-1], str):
+                self._template[-1] += part
+            else:
+                self._template.append(part)
+
+    def variant_count(self):
+        if self._template is None:
+            self._compile()
+
+        return self._variant_count
+
+    # Returns a dict of every permutation's choice tree (as given by
+    # permutate_tree_indices, or () if there are no option groups) to the
+    # rendered translation. Computed once on first use.
+    def variants(self):
+        if self._variants is not None:
+            return self._variants
+        if self._template is None:
+            self._compile()
+
+        slots = []
+        for chunk in self._template:
+            if isinstance(chunk, str):
+                slots.append(((None, chunk),))
+            else:
+                slot = []
+                for i in range(0, len(chunk)):
+                    option_variants = chunk[i].variants()
+                    if len(option_variants) == 1 and () in option_variants:
+                        slot.append((i, option_variants[()]))
+                    else:
+                        slot += [((i, choice), value)
+                            for choice, value in option_variants.items()]
+                slots.append(slot)
+
+        self._variants = {}
+        for values in itertools.product(*slots):
+            self._variants[tuple(choice for choice, value in values
+                    if choice is not None)] \
+                = "".join([value for choice, value in values])
+
+        return self._variants
+
+    def _render(self, choice_tree):
+        values = []
+        i = 0
+        for chunk in self._template:
+            if isinstance(chunk, str):
+                values.append(chunk)
+            else:
                 choice = choice_tree[i]
                 if isinstance(choice, int):
                     choice = (choice, ())
-                value += part[choice[0]].lookup(choice[1])
+                values.append(chunk[choice[0]].lookup(choice[1]))
                 i += 1
+
+        return "".join(values)
+
+    def lookup(self, choice_tree):
+        if self._variants is None:
+            if self.variant_count() <= AdvancedTranslation.max_table_size:
+                self.variants()
             else:
-                value += part
+                return self._render(choice_tree)
+
+        value = self._variants.get(choice_tree)
+        if value is None:
+            value = self._render(choice_tree)
 
         return value
 
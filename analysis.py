@@ -0,0 +1,266 @@
+import json
+
+from advanced_translation import AdvancedTranslation
+from advanced_stroke_sequence import AdvancedStrokeSequence, ParseError, \
+    ExpansionError
+from advanced_steno_dictionary import AdvancedStenoDictionary, \
+    entry_stroke_sequences, invalid_entry_message
+from permutate import iter_tree_indices
+from stroke import StrokeSequence
+
+
+# Stands in for the stroke sequences added to a mixin during analysis.
+class _EstimatedStrokeSequences:
+    def __init__(self, count, keys):
+        self.count = count
+        # Stroke sequence keys if there is exactly one known stroke sequence
+        self.keys = keys
+
+    def __len__(self):
+        return self.count
+
+# Mixin which only tracks how many variants it has.
+class MixinEstimate:
+    __slots__ = ("change_side", "count", "keys", "references", "version")
+
+    def __init__(self, change_side = 0):
+        self.change_side = change_side
+        # Upper bound of the number of variants
+        self.count = 0
+        # Stroke sequence keys of the only variant, if it's known
+        self.keys = None
+        self.references = 0
+        self.version = None
+
+    # Estimate of a real (base or library) mixin, starting from its variants.
+    @classmethod
+    def from_mixin(cls, mixin):
+        estimate = cls(mixin.change_side)
+        estimate.count = mixin.variant_count()
+        if estimate.count == 1:
+            estimate.keys = mixin.stroke_sequence_keys()[0]
+        estimate.references = mixin.references
+
+        return estimate
+
+    def variant_count(self):
+        return self.count
+
+    # The only variant if it's known, otherwise nothing.
+    def stroke_sequence_keys(self):
+        return () if self.keys is None else (self.keys,)
+
+    def variant_array(self):
+        return None
+
+    def add(self, estimated):
+        if estimated.count == 0:
+            return
+
+        if self.count == 0:
+            self.count = estimated.count
+            self.keys = estimated.keys
+        elif self.keys is None or estimated.keys != self.keys:
+            self.count += estimated.count
+            self.keys = None
+
+# Dictionary whose mixins are MixinEstimates, entries are parsed but not
+# expanded.
+class _AnalysisDictionary(AdvancedStenoDictionary):
+    def __init__(self, key_layout):
+        super().__init__(key_layout)
+        # MixinEstimates have no version to key expansions by
+        self.expansion_cache = None
+        self.estimate_mixins()
+
+    def new_mixin(self, change_side):
+        return MixinEstimate(change_side)
+
+    # Replaces the real mixins (base mixins, or library mixins once a
+    # library is applied) with MixinEstimates, so variants the source adds
+    # to them are counted.
+    def estimate_mixins(self):
+        estimates = {}
+        for key, mixin in self.mixins.items():
+            if not isinstance(mixin, MixinEstimate):
+                if id(mixin) not in estimates:
+                    estimates[id(mixin)] = MixinEstimate.from_mixin(mixin)
+                self.mixins[key] = estimates[id(mixin)]
+        self.parse_cache.clear()
+
+# Stroke key bitmasks of the only stroke sequence a stroke sequence expands
+# to, found by combining the single variant of each part (and of the
+# selected options) without running the expansion, or None if a part's
+# variant isn't known.
+def _single_keys(ss, selection_tree):
+    program = ss.program()
+    keys = (0,)
+    for operand_id, action, slot in program.instructions:
+        operand = program.operands[operand_id]
+        if slot < 0:
+            part_keys = operand.stroke_sequence_keys()
+            if len(part_keys) != 1:
+                return None
+            keys_b = part_keys[0]
+        else:
+            choice = selection_tree[slot] if len(selection_tree) > 0 else 0
+            if choice.__class__ is int:
+                option, choice = operand[choice], ()
+            else:
+                option, choice = operand[choice[0]], choice[1]
+
+            if isinstance(option, AdvancedStrokeSequence):
+                keys_b = _single_keys(option, choice)
+                if keys_b is None:
+                    return None
+            else:
+                part_keys = option.to_simple_stroke_sequence_keys(choice)
+                if len(part_keys) != 1:
+                    return None
+                keys_b = part_keys[0]
+
+        if action == 0:
+            keys = keys[:-1] + (keys[-1] | keys_b[0],) + keys_b[1:]
+        else:
+            keys = keys[:-1] + (keys[-1] & ~keys_b[0],) + keys_b[1:]
+
+    return keys
+
+class EntryAnalysis:
+    def __init__(self, translation_str):
+        self.translation_str = translation_str
+        # Translation permutations (for each stroke sequence)
+        self.permutations = 0
+        # Upper bound of the stroke sequences made by expanding the entry
+        self.sequences = 0
+        self.errors = []
+
+# Predicts the size of a dictionary build without expanding it.
+#
+# The number of translation permutations of each entry is exact. The number
+# of stroke sequences is the product of the number of variants of the mixins
+# used, it's exact unless combinations of variants give the same stroke
+# sequence, otherwise it's an upper bound. Entries whose mixins all have a
+# single known variant have a single known key, conflicts between these
+# keys are predicted.
+class DictionaryAnalysis:
+    def __init__(self, key_layout, mixin_library = None):
+        self.dictionary = _AnalysisDictionary(key_layout)
+        if mixin_library is not None:
+            mixin_library.apply(self.dictionary)
+            self.dictionary.estimate_mixins()
+
+        self.entries = []
+        # Upper bound of the number of entries in the output
+        self.output_entries = 0
+        # Stroke key bitmasks -> (translation_str, ss_str, simple_translation)
+        # of the last entry with that single known key
+        self.keys = {}
+        # (key_str, (translation_str, ss_str, simple_translation) replaced,
+        # (translation_str, ss_str, simple_translation) replacing)
+        self.conflicts = []
+
+    def add_entries(self, entries):
+        for translation_str, ss_strs in entries:
+            ss_strs = [ss_strs] if isinstance(ss_strs, str) else ss_strs
+            self.add_entry(translation_str, ss_strs)
+
+    def add_entry(self, translation_str, ss_strs):
+        dictionary = self.dictionary
+        translation = AdvancedTranslation(translation_str)
+        entry = EntryAnalysis(translation_str)
+        self.entries.append(entry)
+
+        value = ss_strs
+        ss_strs = entry_stroke_sequences(value)
+        if ss_strs is None:
+            entry.errors.append(
+                (json.dumps(value, ensure_ascii = False), invalid_entry_message))
+            return
+
+        for ss_str in ss_strs:
+            try:
+                ss = dictionary.parse_stroke_sequence(ss_str, translation)
+                ss_mixins = {mixin for key, mixin in ss.dependencies()}
+
+                # As in AdvancedStenoDictionary._add_entry, stroke sequences
+                # are only estimated once for each distinct selection of the
+                # option groups they're bound to, while the mixins they use
+                # are unchanged.
+                bound_indices = ss.bound_indices()
+                estimates = {}
+                estimates_state = None
+
+                for indices in iter_tree_indices(translation):
+                    entry.permutations += 1
+
+                    state = [mixin.variant_count() for mixin in ss_mixins]
+                    if state != estimates_state:
+                        estimates = {}
+                        estimates_state = state
+
+                    binding = ss.binding(indices, bound_indices)
+                    estimate = estimates.get(binding)
+                    if estimate is None:
+                        count = ss.variant_count(indices)
+                        estimate = (count,
+                            _single_keys(ss, indices) if count == 1 else None)
+                        estimates[binding] = estimate
+                    count, keys = estimate
+
+                    # Only looked up if it's used
+                    simple_translation = None
+                    if translation.is_mixin or keys is not None:
+                        simple_translation = translation.lookup(indices)
+
+                    if translation.is_mixin:
+                        dictionary.add_mixin(
+                            simple_translation,
+                            translation.mixin_side,
+                            translation.change_side,
+                            _EstimatedStrokeSequences(count, keys))
+
+                    if translation.is_entry:
+                        entry.sequences += count
+                        self.output_entries += count
+                        if keys is not None:
+                            self._add_key(keys,
+                                (translation_str, ss_str, simple_translation))
+            except(ParseError, LookupError, ExpansionError) as e:
+                entry.errors.append((ss_str, str(e)))
+
+    def _add_key(self, keys, source):
+        existing = self.keys.get(keys)
+        if existing is not None:
+            key_str = StrokeSequence.from_keys(
+                self.dictionary.key_layout, keys).to_string()
+            self.conflicts.append((key_str, existing, source))
+        self.keys[keys] = source
+
+    def worst_entries(self, count):
+        return sorted(self.entries, key = lambda entry: -entry.sequences)[:count]
+
+    def report(self, count):
+        lines = [
+            "entries\t" + str(len(self.entries)),
+            "translation permutations\t"
+                + str(sum(entry.permutations for entry in self.entries)),
+            "output entries (at most)\t" + str(self.output_entries),
+            "entries with errors\t"
+                + str(sum(1 for entry in self.entries if len(entry.errors) > 0)),
+            "predicted conflicts\t" + str(len(self.conflicts)),
+            "",
+            "sequences\tpermutations\tentry"]
+        for entry in self.worst_entries(count):
+            lines.append("%d\t%d\t%s" % (
+                entry.sequences, entry.permutations, entry.translation_str))
+
+        if len(self.conflicts) > 0:
+            lines.append("")
+            lines.append("strokes\tentry\tconflicting entry")
+            for key_str, existing, source in self.conflicts:
+                lines.append(key_str
+                    + "\t" + existing[0] + ": " + existing[1]
+                    + "\t" + source[0] + ": " + source[1])
+
+        return "\n".join(lines)
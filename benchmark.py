@@ -0,0 +1,272 @@
+#!/usr/bin/python
+
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tracemalloc
+
+from stroke import KeyLayout, DEFAULT_LAYOUT
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from profiler import BuildProfiler
+
+
+LEFT_MIXINS = [
+    ("J", "SKWR"), ("V", "SR"), ("G", "TKPW"), ("N", "TPH"), ("D", "TK"),
+    ("F", "TP"), ("X", "KP"), ("Q", "KW"), ("C", "KR"), ("B", "PW"),
+    ("M", "PH"), ("L", "HR"), ("Sh", "SH"), ("Th", "TH"), ("Ch", "KH")]
+VOWEL_MIXINS = [
+    ("Aa", "AEU"), ("Oo", "AO"), ("Oe", "OE"), ("Ee", "AOE"), ("Uu", "AOU"),
+    ("I", "EU"), ("Ii", "AOEU"), ("Aw", "AU"), ("Oi", "OEU"), ("Ow", "OU")]
+RIGHT_MIXINS = [
+    ("J", "-PBLG"), ("N", "-PB"), ("M", "-PL"), ("K", "-BG"), ("Sh", "-RB"),
+    ("Ch", "-FP"), ("Ng", "-PBG"), ("Mp", "-FPL"), ("Lk", "-LG")]
+# Mixins with several variants, words starting with them share the prefix
+# expansion (see AdvancedStrokeSequence._expand_prefix)
+SHARED_LEFT_MIXINS = [
+    ("Sn", ["TPH", "STPH", "TKPWH", "SKWR"]), ("Sr", ["TPR", "KWR", "PHR", "SR"])]
+SHARED_VOWEL_MIXINS = [
+    ("Sa", ["A", "AE", "AEU", "AU"]), ("So", ["O", "AO", "OE", "OU"])]
+LEFT_KEYS = ["S", "T", "K", "P", "W", "H", "R"]
+VOWEL_KEYS = ["A", "O", "E", "U"]
+RIGHT_KEYS = ["-F", "-R", "-P", "-B", "-L", "-G", "-T", "-S", "-D", "-Z"]
+SUFFIXES = [("s", "-S"), ("ed", "-D"), ("ing", "-G"), ("er", "-R"), ("ly", "-L")]
+
+
+# Letters only name for a number, so it can be used as a mixin reference
+# (e.g. 0 -> "a", 27 -> "bb").
+def _letters(i):
+    name = ""
+    while True:
+        name = chr(ord("a") + i % 26) + name
+        i //= 26
+        if i == 0:
+            return name
+
+# Generates a synthetic advanced dictionary source as a list of
+# (translation, strokes) pairs.
+#
+# mixin_depth - Number of levels of mixins built from other mixins.
+# option_groups - Option groups per word translation, bound to strokes.
+# removal_rate - Fraction of words using ^ key removal.
+# multi_stroke_rate - Fraction of words using a multi stroke (/) mixin.
+# shared_prefix_rate - Fraction of words starting with mixins with several
+#     variants shared with other words.
+def synthetic_source(
+    entry_count,
+    mixin_depth = 2,
+    option_groups = 1,
+    removal_rate = 0.05,
+    multi_stroke_rate = 0.1,
+    shared_prefix_rate = 0.0,
+    seed = 0
+):
+    rng = random.Random(seed)
+    source = []
+
+    for name, strokes in LEFT_MIXINS:
+        source.append((name + "|ml", strokes))
+    for name, strokes in VOWEL_MIXINS:
+        source.append((name + "|mR", strokes))
+    for name, strokes in RIGHT_MIXINS:
+        source.append((name + "|mr", strokes))
+    if shared_prefix_rate > 0:
+        for name, strokes in SHARED_LEFT_MIXINS:
+            source.append((name + "|ml", strokes))
+        for name, strokes in SHARED_VOWEL_MIXINS:
+            source.append((name + "|mR", strokes))
+
+    def syllable(left, vowels, right):
+        return rng.choice(left) + rng.choice(vowels) + rng.choice(right)
+
+    left = [name for name, strokes in LEFT_MIXINS] + LEFT_KEYS
+    vowels = [name for name, strokes in VOWEL_MIXINS] + VOWEL_KEYS
+    right = ["-" + name for name, strokes in RIGHT_MIXINS] + RIGHT_KEYS
+
+    # Each level of mixins is built from the previous level, level 0 is
+    # plain keys and the mixins above.
+    previous_level = None
+    for level in range(1, mixin_depth + 1):
+        level_names = []
+        for i in range(0, 20):
+            name = "Lv" + _letters(level) + "x" + _letters(i)
+            if previous_level is None:
+                strokes = syllable(left, vowels, right)
+            else:
+                # Variants of a mixin from the previous level
+                strokes = [rng.choice(previous_level) + rng.choice(RIGHT_KEYS)
+                    for j in range(0, rng.randint(1, 3))]
+            source.append((name + "|m", strokes))
+            level_names.append(name)
+        previous_level = level_names
+
+    multi_stroke_mixins = []
+    for i in range(0, 10):
+        name = "Ms" + _letters(i)
+        source.append((name + "|m",
+            syllable(left, vowels, right) + "/" + syllable(left, vowels, [""])))
+        multi_stroke_mixins.append(name)
+
+    word_count = max(0, entry_count - len(source))
+    for i in range(0, word_count):
+        translation = "w" + _letters(i)
+        if shared_prefix_rate > 0 and rng.random() < shared_prefix_rate:
+            strokes = rng.choice(SHARED_LEFT_MIXINS)[0] \
+                + rng.choice(SHARED_VOWEL_MIXINS)[0] \
+                + rng.choice(right) + rng.choice(RIGHT_KEYS)
+        elif previous_level is not None and rng.random() < 0.3:
+            strokes = rng.choice(previous_level) + rng.choice(RIGHT_KEYS)
+        elif rng.random() < multi_stroke_rate:
+            strokes = rng.choice(multi_stroke_mixins) + rng.choice(right)
+        else:
+            strokes = syllable(left, vowels, right)
+
+        if rng.random() < removal_rate:
+            strokes += "^" + rng.choice(VOWEL_KEYS)
+
+        for j in range(0, option_groups):
+            suffixes = rng.sample(SUFFIXES, 2)
+            translation += "[" + ",".join([suffix for suffix, suffix_strokes in suffixes]) + ",]"
+            strokes += "&[" + ",".join([suffix_strokes for suffix, suffix_strokes in suffixes]) + ",]"
+
+        source.append((translation, strokes))
+
+    return source
+
+def _new_dictionary(key_layout, expansion_cache):
+    dictionary = AdvancedStenoDictionary(key_layout)
+    if not expansion_cache:
+        dictionary.expansion_cache = None
+
+    return dictionary
+
+# Builds source with a BuildProfiler attached and returns the seconds spent
+# in each phase of the build, and the number of output entries. Parsing,
+# permutation, expansion and mixin times are measured by the profiler hooks
+# in the normal build path, "other_entry" is the rest of the time spent
+# processing entries (mostly applying entries).
+def _phase_times(key_layout, source, expansion_cache):
+    dictionary = _new_dictionary(key_layout, expansion_cache)
+    profiler = BuildProfiler()
+    dictionary.profiler = profiler
+    dictionary.add_entries(source)
+
+    entries = profiler.entries.values()
+    phases = {
+        "translation_parse":
+            sum(entry.translation_parse_seconds for entry in entries),
+        "stroke_sequence_parse": sum(entry.parse_seconds for entry in entries),
+        "permutation": sum(entry.permutation_seconds for entry in entries),
+        "expansion": sum(entry.expansion_seconds for entry in entries),
+        "mixins": sum(mixin.seconds for mixin in profiler.mixins.values())}
+    phases["other_entry"] = sum(entry.seconds for entry in entries) \
+        - sum(phases.values())
+
+    start = time.perf_counter()
+    json.dumps(dictionary.entries,
+        ensure_ascii = False, sort_keys = True,
+        indent = 0, separators = (',', ': '))
+    phases["json_emission"] = time.perf_counter() - start
+
+    return phases, len(dictionary.entries)
+
+# Builds source with AdvancedStenoDictionary.add_entries, returning
+# (seconds, peak memory in bytes, dictionary).
+def _build(key_layout, source, trace_memory, expansion_cache):
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    dictionary = _new_dictionary(key_layout, expansion_cache)
+    dictionary.add_entries(source)
+    json.dumps(dictionary.entries,
+        ensure_ascii = False, sort_keys = True,
+        indent = 0, separators = (',', ': '))
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return seconds, peak, dictionary
+
+# If expansion_cache is False, the dictionary's expansion cache is disabled.
+def run_benchmark(key_layout, entry_count, repeat = 3, expansion_cache = True,
+        **parameters):
+    source = synthetic_source(entry_count, **parameters)
+
+    logger_level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.ERROR)
+    try:
+        build_seconds = min(_build(key_layout, source, False, expansion_cache)[0]
+            for i in range(0, repeat))
+        seconds, peak_memory, dictionary = _build(
+            key_layout, source, True, expansion_cache)
+        phases, output_entries = _phase_times(key_layout, source, expansion_cache)
+    finally:
+        logging.getLogger().setLevel(logger_level)
+
+    return {
+        "parameters": dict(parameters,
+            entry_count = entry_count, expansion_cache = expansion_cache),
+        "source_entries": len(source),
+        "output_entries": output_entries,
+        "build_seconds": build_seconds,
+        "peak_memory_bytes": peak_memory,
+        "phase_seconds": phases}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description = "Benchmark dictionary builds using synthetic sources.")
+    parser.add_argument("--entries", default = "1000,10000",
+        help = "comma separated source entry counts (default: %(default)s)")
+    parser.add_argument("--mixin-depth", type = int, default = 2)
+    parser.add_argument("--option-groups", type = int, default = 1)
+    parser.add_argument("--removal-rate", type = float, default = 0.05)
+    parser.add_argument("--multi-stroke-rate", type = float, default = 0.1)
+    parser.add_argument("--shared-prefix-rate", type = float, default = 0.0)
+    parser.add_argument("--no-expansion-cache", action = "store_true",
+        help = "disable the cache of shared mixin prefix expansions")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--repeat", type = int, default = 3,
+        help = "number of timed builds, the fastest is reported")
+    parser.add_argument("--output", metavar = "PATH",
+        help = "write the JSON report to PATH instead of stdout")
+    parser.add_argument("--dump-source", metavar = "PATH",
+        help = "write the synthetic source for the largest entry count to PATH")
+    args = parser.parse_args()
+
+    layout = KeyLayout.from_string(DEFAULT_LAYOUT)
+    parameters = {
+        "mixin_depth": args.mixin_depth,
+        "option_groups": args.option_groups,
+        "removal_rate": args.removal_rate,
+        "multi_stroke_rate": args.multi_stroke_rate,
+        "shared_prefix_rate": args.shared_prefix_rate,
+        "seed": args.seed}
+    entry_counts = [int(count) for count in args.entries.split(",")]
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [run_benchmark(layout, entry_count, args.repeat,
+                not args.no_expansion_cache, **parameters)
+            for entry_count in entry_counts]}
+
+    if args.dump_source is not None:
+        with open(args.dump_source, "w") as source_file:
+            source = synthetic_source(max(entry_counts), **parameters)
+            source_file.write("{\n" + ",\n".join(
+                [json.dumps(translation, ensure_ascii = False) + ": "
+                        + json.dumps(strokes, ensure_ascii = False)
+                    for translation, strokes in source]) + "\n}\n")
+
+    report_str = json.dumps(report, indent = 2, sort_keys = True)
+    if args.output is not None:
+        with open(args.output, "w") as report_file:
+            report_file.write(report_str + "\n")
+    else:
+        print(report_str)
@@ -0,0 +1,210 @@
+import mmap
+import struct
+
+from stroke import KeyLayout, Stroke, stroke_sequence_keys
+
+
+# File layout (all integers little endian):
+#
+#   header        magic, format version, stroke width (bytes per stroke),
+#                 maximum strokes per entry, entry count, key layout length,
+#                 break keys
+#   key layout    UTF-8 key layout string
+#   keys          entry count fixed width keys in ascending byte order, each
+#                 is a stroke count byte followed by maximum strokes
+#                 big endian stroke key bitmasks, padded with zeros
+#   translations  entry count (offset, length) pairs into the string pool,
+#                 in the same order as keys
+#   reverse       entry count entry indices in ascending translation order
+#                 (then key order)
+#   string pool   deduplicated UTF-8 translations
+MAGIC = b"ASDB"
+FORMAT_VERSION = 2
+_header = struct.Struct("<4sIIIIIII")
+_translation = struct.Struct("<II")
+_index = struct.Struct("<I")
+
+
+def _stroke_width(key_layout):
+    return (len(key_layout.keys) + 7) // 8
+
+def encode_key(keys, stroke_width, max_strokes):
+    return bytes((len(keys),)) \
+        + b"".join([stroke_keys.to_bytes(stroke_width, "big")
+            for stroke_keys in keys]) \
+        + bytes(stroke_width * (max_strokes - len(keys)))
+
+# Writes entries (dict of stroke sequence string -> translation) as a binary
+# dictionary which can be read with BinaryDictionary.
+def write_binary_dictionary(path, key_layout, entries):
+    stroke_width = _stroke_width(key_layout)
+
+    parsed = [(stroke_sequence_keys(key_layout, key_str), translation)
+        for key_str, translation in entries.items()]
+    max_strokes = max([len(keys) for keys, translation in parsed], default = 0)
+    if max_strokes > 255:
+        raise ValueError("Entries can't have more than 255 strokes")
+
+    records = sorted((encode_key(keys, stroke_width, max_strokes), translation)
+        for keys, translation in parsed)
+    # Code point order, the same as the order of the UTF-8 translations
+    reverse = sorted(range(0, len(records)), key = lambda i: records[i][1])
+
+    pool = bytearray()
+    pool_offsets = {}
+    translations = bytearray()
+    for key, translation in records:
+        offset = pool_offsets.get(translation)
+        encoded = translation.encode("utf-8")
+        if offset is None:
+            offset = len(pool)
+            pool_offsets[translation] = offset
+            pool += encoded
+        translations += _translation.pack(offset, len(encoded))
+
+    layout_keys = key_layout.keys.encode("utf-8")
+    with open(path, "wb") as out_file:
+        out_file.write(_header.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            stroke_width,
+            max_strokes,
+            len(records),
+            len(layout_keys),
+            key_layout.break_keys[0],
+            key_layout.break_keys[1]))
+        out_file.write(layout_keys)
+        for key, translation in records:
+            out_file.write(key)
+        out_file.write(translations)
+        out_file.write(b"".join([_index.pack(i) for i in reverse]))
+        out_file.write(pool)
+
+# Read only dictionary backed by a memory mapped binary dictionary file,
+# lookups binary search the file without loading it.
+class BinaryDictionary:
+    def __init__(self, path):
+        with open(path, "rb") as in_file:
+            self.mmap = mmap.mmap(in_file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        magic, version, self.stroke_width, self.longest_key, self.count, \
+            layout_length, break_key_0, break_key_1 \
+            = _header.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            self.mmap.close()
+            raise ValueError(path + " is not a binary dictionary")
+        if version != FORMAT_VERSION:
+            self.mmap.close()
+            raise ValueError(path + " has unsupported format version "
+                + str(version) + ", rebuild it with --binary-output")
+
+        offset = _header.size
+        self.key_layout = KeyLayout(
+            self.mmap[offset:offset + layout_length].decode("utf-8"),
+            (break_key_0, break_key_1))
+        offset += layout_length
+
+        self.key_size = 1 + self.stroke_width * self.longest_key
+        self.keys_offset = offset
+        self.translations_offset = self.keys_offset + self.key_size * self.count
+        self.reverse_offset = self.translations_offset + _translation.size * self.count
+        self.pool_offset = self.reverse_offset + _index.size * self.count
+
+    def close(self):
+        self.mmap.close()
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, i):
+        offset = self.keys_offset + i * self.key_size
+        return self.mmap[offset:offset + self.key_size]
+
+    def _key_str(self, i):
+        key = self._key(i)
+        return "/".join([Stroke.from_keys(
+                self.key_layout,
+                int.from_bytes(key[1 + j * self.stroke_width:1 + (j + 1) * self.stroke_width], "big"))
+                .to_string()
+            for j in range(0, key[0])])
+
+    def _translation_bytes(self, i):
+        offset, length = _translation.unpack_from(
+            self.mmap, self.translations_offset + i * _translation.size)
+        offset += self.pool_offset
+
+        return self.mmap[offset:offset + length]
+
+    def _translation(self, i):
+        return self._translation_bytes(i).decode("utf-8")
+
+    def _reverse_index(self, i):
+        return _index.unpack_from(self.mmap, self.reverse_offset + i * _index.size)[0]
+
+    def _index(self, keys):
+        if len(keys) > self.longest_key:
+            return None
+
+        key = encode_key(keys, self.stroke_width, self.longest_key)
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.count and self._key(low) == key:
+            return low
+        return None
+
+    # strokes is either a stroke sequence string ("TRAPBLG/EUBG") or a
+    # sequence of stroke key bitmasks.
+    def lookup(self, strokes, default = None):
+        if isinstance(strokes, str):
+            strokes = stroke_sequence_keys(self.key_layout, strokes)
+
+        i = self._index(strokes)
+        if i is None:
+            return default
+
+        return self._translation(i)
+
+    def __getitem__(self, strokes):
+        translation = self.lookup(strokes)
+        if translation is None:
+            raise KeyError(strokes)
+
+        return translation
+
+    def __contains__(self, strokes):
+        return self.lookup(strokes) is not None
+
+    # Stroke sequence strings of the entries translating to translation, in
+    # key order. Binary searches the reverse index.
+    def reverse_lookup(self, translation):
+        translation = translation.encode("utf-8")
+
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._translation_bytes(self._reverse_index(middle)) < translation:
+                low = middle + 1
+            else:
+                high = middle
+
+        key_strs = []
+        while low < self.count:
+            i = self._reverse_index(low)
+            if self._translation_bytes(i) != translation:
+                break
+            key_strs.append(self._key_str(i))
+            low += 1
+
+        return key_strs
+
+    def items(self):
+        for i in range(0, self.count):
+            yield self._key_str(i), self._translation(i)
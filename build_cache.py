@@ -0,0 +1,166 @@
+import hashlib
+import json
+
+from stroke import StrokeSequence
+
+
+def entry_hash(translation_str, ss_strs):
+    return hashlib.sha1(
+        json.dumps([translation_str, ss_strs], ensure_ascii = False)
+            .encode("utf-8")).hexdigest()
+
+# JSON identity of a key layout, files built for one layout can't be used
+# with another.
+def layout_id(key_layout):
+    return [key_layout.keys, list(key_layout.break_keys)]
+
+class BuildRecord:
+    def __init__(self, dependencies = None, outputs = None, expansion = 0):
+        # mixin key -> mixin version at the time the entry was expanded
+        self.dependencies = {} if dependencies is None else dependencies
+        # Stroke sequence combinations made expanding the entry, checked
+        # against the max_expansion of the build replaying it
+        self.expansion = expansion
+        # In order of creation:
+        # ("m", simple_translation, mixin_side, change_side, stroke sequences keys)
+        # ("e", ss_str, key_str, simple_translation)
+        # ("x", ss_str, error message)
+        self.outputs = [] if outputs is None else outputs
+
+    def add_dependencies(self, advanced_stroke_sequence):
+        for key, mixin in advanced_stroke_sequence.dependencies():
+            self.dependencies[key] = mixin.version
+
+    def add_mixin(self, simple_translation, side, change_side, stroke_sequences):
+        self.outputs.append(("m", simple_translation, side, change_side,
+            [stroke_sequence.to_keys() for stroke_sequence in stroke_sequences]))
+
+    def add_entry(self, ss_str, key_str, simple_translation):
+        self.outputs.append(("e", ss_str, key_str, simple_translation))
+
+    def add_error(self, ss_str, message):
+        self.outputs.append(("x", ss_str, message))
+
+    def is_valid(self, dictionary):
+        if dictionary.max_expansion is not None \
+                and self.expansion > dictionary.max_expansion:
+            return False
+
+        for key, version in self.dependencies.items():
+            mixin = dictionary.mixins.get(key)
+            if mixin is None or mixin.version != version:
+                return False
+
+        return True
+
+    def add_references(self, dictionary):
+        dictionary.add_references({dictionary.mixins[key]
+            for key in self.dependencies
+            if key in dictionary.mixins})
+
+    # Mixin references are counted when entries are replayed.
+    def replay(self, dictionary, translation_str, mixins = True, entries = True):
+        if entries:
+            self.add_references(dictionary)
+
+        for output in self.outputs:
+            if output[0] == "m":
+                if mixins:
+                    dictionary.add_mixin(output[1], output[2], output[3],
+                        [StrokeSequence.from_keys(dictionary.key_layout, keys)
+                            for keys in output[4]])
+            elif not entries:
+                continue
+            elif output[0] == "e":
+                dictionary.add_entry_output(
+                    translation_str, output[1], output[2], output[3])
+            else:
+                dictionary.log_entry_error(translation_str, output[1], output[2])
+
+# Entry outputs only store the entry's stroke sequence string, its stroke key
+# bitmasks are parsed from it when needed, which keeps the cache file small
+# and quick to load.
+class BuildCache:
+    format_version = 5
+
+    def __init__(self, key_layout):
+        self.key_layout = key_layout
+        # entry hash -> BuildRecord
+        self.records = {}
+        self.used = set()
+        # Whether records differ from the last loaded or saved cache file.
+        self.dirty = False
+
+        # Lookups since the cache was made, reported by --profile
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, dictionary, translation_str, ss_strs):
+        key = entry_hash(translation_str, ss_strs)
+        self.used.add(key)
+
+        record = self.records.get(key)
+        if record is not None and record.is_valid(dictionary):
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        return None
+
+    def store(self, translation_str, ss_strs, record):
+        key = entry_hash(translation_str, ss_strs)
+        self.used.add(key)
+        self.records[key] = record
+        self.dirty = True
+
+    def prune(self):
+        if len(self.used) != len(self.records):
+            self.records = {key: record for key, record in self.records.items()
+                if key in self.used}
+            self.dirty = True
+        self.used = set()
+
+    def load(self, path):
+        try:
+            with open(path, encoding = "utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return False
+
+        if data.get("format_version") != BuildCache.format_version \
+                or data.get("key_layout") != layout_id(self.key_layout):
+            return False
+
+        self.records = {
+            key: BuildRecord(
+                record["dependencies"],
+                [(output[0], output[1], output[2], output[3],
+                        [tuple(keys) for keys in output[4]])
+                    if output[0] == "m"
+                    else tuple(output)
+                    for output in record["outputs"]],
+                record["expansion"])
+            for key, record in data["records"].items()}
+        self.dirty = False
+
+        return True
+
+    # Only writes the cache file if it's out of date.
+    def save(self, path):
+        self.prune()
+        if not self.dirty:
+            return
+
+        with open(path, "w", encoding = "utf-8") as cache_file:
+            cache_file.write(json.dumps({
+                    "format_version": BuildCache.format_version,
+                    "key_layout": layout_id(self.key_layout),
+                    "records": {
+                        key: {
+                            "dependencies": record.dependencies,
+                            "outputs": record.outputs,
+                            "expansion": record.expansion}
+                        for key, record in self.records.items()}},
+                ensure_ascii = False,
+                separators = (',', ':')))
+        self.dirty = False
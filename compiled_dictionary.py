@@ -0,0 +1,145 @@
+import os
+import glob
+import json
+import hashlib
+
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from binary_dictionary import BinaryDictionary, write_binary_dictionary, \
+    FORMAT_VERSION
+from build_cache import layout_id
+from stroke import stroke_sequence_keys
+from watch import replace_atomically
+
+
+# Path of the compiled dictionary of the source at source_path with the
+# content hash digest, next to the source.
+def compiled_path(source_path, digest):
+    return source_path + "." + digest[:16] + ".asdb"
+
+# Hash of the content of the source at source_path, along with everything
+# else the compiled dictionary depends on.
+def source_digest(key_layout, source_path):
+    digest = hashlib.sha1(repr((FORMAT_VERSION, layout_id(key_layout))).encode())
+    with open(source_path, "rb") as source_file:
+        digest.update(source_file.read())
+
+    return digest.hexdigest()
+
+# Compiles the advanced dictionary source at source_path to a binary
+# dictionary at output_path, replacing any compiled dictionaries of older
+# versions of the source.
+def compile_dictionary(key_layout, source_path, output_path):
+    with open(source_path, encoding = "utf-8") as data_file:
+        entries = json.load(data_file, object_pairs_hook=tuple)
+
+    dictionary = AdvancedStenoDictionary(key_layout)
+    dictionary.add_entries(entries)
+
+    replace_atomically(output_path,
+        lambda path: write_binary_dictionary(path, key_layout, dictionary.entries))
+
+    for path in glob.glob(glob.escape(source_path) + ".*.asdb"):
+        if path != output_path:
+            try:
+                os.remove(path)
+            except OSError:
+                # Still open elsewhere, left for a later compile
+                pass
+
+# Plover's form of a stroke sequence string, a tuple of strokes. Strokes with
+# only left keys don't end with a hyphen (e.g. "TPH-" is "TPH").
+def plover_key(key_str):
+    return tuple(stroke_str[:-1]
+            if len(stroke_str) > 1 and stroke_str[-1] == "-" else stroke_str
+        for stroke_str in key_str.split("/"))
+
+# Read only dictionary of an advanced dictionary source, with the interface
+# of Plover's dictionaries (keys are tuples of stroke strings, normalized as
+# Plover does, see plover_key).
+#
+# The source is compiled once to a binary dictionary (see
+# binary_dictionary.py) stored next to it, named by a hash of the source's
+# content and the key layout. Later loads only hash the source and memory map
+# the compiled dictionary, lookups and reverse lookups binary search it.
+class CompiledDictionary:
+    def __init__(self, key_layout, source_path):
+        self.binary = None
+        self.key_layout = key_layout
+        self.source_path = source_path
+
+        self.path = compiled_path(source_path, source_digest(key_layout, source_path))
+        if not os.path.exists(self.path):
+            compile_dictionary(key_layout, source_path, self.path)
+
+        self.binary = BinaryDictionary(self.path)
+        self.longest_key = self.binary.longest_key
+        # Lower case translation -> set of translations, made on first use
+        self.casereverse_index = None
+
+    def close(self):
+        if self.binary is not None:
+            self.binary.close()
+            self.binary = None
+
+    def __del__(self):
+        self.close()
+
+    # Stroke key bitmasks of a key, or None if it has strokes which aren't
+    # valid in the key layout.
+    def _keys(self, key):
+        keys = stroke_sequence_keys(self.key_layout, "/".join(key))
+        if 0 in keys:
+            return None
+
+        return keys
+
+    def __len__(self):
+        return len(self.binary)
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        for key_str, translation in self.binary.items():
+            yield plover_key(key_str)
+
+    def values(self):
+        for key_str, translation in self.binary.items():
+            yield translation
+
+    def items(self):
+        for key_str, translation in self.binary.items():
+            yield plover_key(key_str), translation
+
+    def get(self, key, fallback = None):
+        if len(key) > self.longest_key:
+            return fallback
+
+        keys = self._keys(key)
+        if keys is None:
+            return fallback
+
+        return self.binary.lookup(keys, fallback)
+
+    def __getitem__(self, key):
+        translation = self.get(key)
+        if translation is None:
+            raise KeyError(key)
+
+        return translation
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def reverse_lookup(self, value):
+        return {plover_key(key_str)
+            for key_str in self.binary.reverse_lookup(value)}
+
+    def casereverse_lookup(self, value):
+        if self.casereverse_index is None:
+            self.casereverse_index = {}
+            for key_str, translation in self.binary.items():
+                self.casereverse_index.setdefault(
+                    translation.lower(), set()).add(translation)
+
+        return set(self.casereverse_index.get(value.lower(), ()))
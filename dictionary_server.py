@@ -0,0 +1,226 @@
+import os
+import json
+import stat
+import logging
+import threading
+import socketserver
+
+from stroke import Stroke
+from advanced_stroke_sequence import ParseError
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from build_cache import BuildCache
+
+
+class _DictionaryState:
+    def __init__(self, dictionary, entries, translations, sources):
+        self.dictionary = dictionary
+        # key_str -> simple translation
+        self.entries = entries
+        # simple translation -> [key_str]
+        self.translations = translations
+        # key_str -> (translation_str, ss_str) of the source entry
+        self.sources = sources
+
+# Keeps a compiled dictionary in memory, rebuilding it whenever the source
+# file changes. Rebuilds use an in memory BuildCache so only changed entries
+# are re-expanded, it's saved to build_cache_path after each build if given.
+# If mixin_library is given, each build starts from its mixins. If a rebuild
+# fails the last good build is still served, and the source is built again
+# once it changes.
+class DictionaryServer:
+    def __init__(self,
+        key_layout,
+        source_path,
+        build_cache = None,
+        poll_interval = 0.2,
+        mixin_library = None,
+        build_cache_path = None,
+        max_expansion = None,
+        vectorized_expansion = False
+    ):
+        self.key_layout = key_layout
+        self.source_path = source_path
+        self.build_cache = build_cache if build_cache is not None \
+            else BuildCache(key_layout)
+        self.poll_interval = poll_interval
+        self.mixin_library = mixin_library
+        self.build_cache_path = build_cache_path
+        self.max_expansion = max_expansion
+        self.vectorized_expansion = vectorized_expansion
+
+        self.state = None
+        self.source_mtime = None
+        self.build_lock = threading.Lock()
+        # Set to stop watch
+        self.stopped = threading.Event()
+
+        self.rebuild()
+
+    def rebuild(self):
+        with self.build_lock:
+            mtime = os.stat(self.source_path).st_mtime_ns
+            with open(self.source_path) as data_file:
+                entries = json.load(data_file, object_pairs_hook=tuple)
+
+            dictionary = AdvancedStenoDictionary(self.key_layout)
+            if self.mixin_library is not None:
+                self.mixin_library.apply(dictionary)
+            dictionary.max_expansion = self.max_expansion
+            dictionary.vectorized_expansion = self.vectorized_expansion
+            compiled = {}
+            sources = {}
+            for translation_str, ss_str, key_str, simple_translation \
+                    in dictionary.generate_entries(entries, self.build_cache):
+                if key_str in compiled:
+                    dictionary.log_entry_conflict(
+                        translation_str, ss_str, key_str, compiled[key_str])
+
+                compiled[key_str] = simple_translation
+                sources[key_str] = (translation_str, ss_str)
+            self.build_cache.prune()
+            if self.build_cache_path is not None:
+                self.build_cache.save(self.build_cache_path)
+
+            translations = {}
+            for key_str, simple_translation in compiled.items():
+                translations.setdefault(simple_translation, []).append(key_str)
+
+            # Replaced in one assignment so lookups never see a partial build
+            self.state = _DictionaryState(
+                dictionary, compiled, translations, sources)
+            self.source_mtime = mtime
+
+    def watch(self):
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                mtime = os.stat(self.source_path).st_mtime_ns
+            except OSError as e:
+                logging.warning("Error rebuilding " + self.source_path
+                    + ": " + str(e))
+                continue
+            if mtime == self.source_mtime:
+                continue
+
+            try:
+                self.rebuild()
+            except Exception as e:
+                # Not retried until the source changes again
+                self.source_mtime = mtime
+                logging.warning("Error rebuilding " + self.source_path
+                    + ", still serving the last build: "
+                    + type(e).__name__ + ": " + str(e))
+
+    def stop(self):
+        self.stopped.set()
+
+    def normalize_strokes(self, ss_str):
+        return "/".join([Stroke(self.key_layout, stroke_str).to_string()
+            for stroke_str in ss_str.split("/")])
+
+    def lookup(self, ss_str):
+        return self.state.entries.get(self.normalize_strokes(ss_str))
+
+    def reverse_lookup(self, translation):
+        return sorted(self.state.translations.get(translation, []))
+
+    # Returns ((translation_str, ss_str), [mixin key]) for the source entry
+    # and the mixins used by the strokes the entry was built from.
+    def entry_mixins(self, ss_str):
+        state = self.state
+        source = state.sources.get(self.normalize_strokes(ss_str))
+        if source is None:
+            return None, []
+
+        try:
+            keys = state.dictionary.stroke_sequence_mixin_keys(*source)
+        except (ParseError, LookupError):
+            return source, []
+
+        return source, keys
+
+    def handle_request(self, request):
+        if "lookup" in request:
+            return {"translation": self.lookup(request["lookup"])}
+        elif "reverse" in request:
+            return {"strokes": self.reverse_lookup(request["reverse"])}
+        elif "mixins" in request:
+            source, keys = self.entry_mixins(request["mixins"])
+            return {
+                "entry": None if source is None
+                    else {"translation": source[0], "strokes": source[1]},
+                "mixins": keys}
+        else:
+            return {"error": "Unknown request"}
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.dictionary_server.handle_request(
+                    json.loads(line.decode("utf-8")))
+            except (ValueError, TypeError, AttributeError) as e:
+                response = {"error": str(e)}
+
+            self.wfile.write(
+                (json.dumps(response, ensure_ascii = False) + "\n")
+                    .encode("utf-8"))
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+# Serves lookups over a socket, one JSON request per line answered with one
+# JSON response per line:
+#   {"lookup": "TRAPBLG/EUBG"} -> {"translation": "tragic"}
+#   {"reverse": "tragic"} -> {"strokes": ["TRAPBLG/EUBG"]}
+#   {"mixins": "TRAPBLG/EUBLG"} ->
+#       {"entry": {"translation": "tragically", "strokes": "Tragic-L"},
+#        "mixins": ["tragic", "-l"]}
+#
+# address is a port number or host:port for a TCP socket, otherwise the path
+# of a Unix socket. A socket left at the path by an earlier server is
+# replaced, any other file is an error. The socket is removed on shutdown.
+def serve(dictionary_server, address):
+    server = create_server(dictionary_server, address)
+
+    watcher = threading.Thread(target = dictionary_server.watch, daemon = True)
+    watcher.start()
+
+    try:
+        server.serve_forever()
+    finally:
+        close_server(server)
+
+# Socket server answering requests with dictionary_server, see serve.
+def create_server(dictionary_server, address):
+    host, separator, port = address.rpartition(":")
+    if port.isdigit():
+        server = _TCPServer((host or "localhost", int(port)), _RequestHandler)
+        server.socket_path = None
+    else:
+        if _is_socket(address):
+            os.remove(address)
+        elif os.path.lexists(address):
+            raise FileExistsError(address + " exists and is not a socket")
+        server = _UnixServer(address, _RequestHandler)
+        server.socket_path = address
+    server.dictionary_server = dictionary_server
+
+    return server
+
+# Closes a server made by create_server, stopping its dictionary server's
+# watch and removing its Unix socket.
+def close_server(server):
+    server.dictionary_server.stop()
+    server.server_close()
+    if server.socket_path is not None and _is_socket(server.socket_path):
+        os.remove(server.socket_path)
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
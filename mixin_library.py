@@ -0,0 +1,98 @@
+import hashlib
+import json
+
+from stroke import StrokeSequence
+from build_cache import layout_id
+from advanced_steno_dictionary import Mixin
+
+
+class MixinLibrary:
+    format_version = 3
+
+    # mixins - list of ([mixin key], Mixin) for each distinct mixin
+    def __init__(self, key_layout, mixins):
+        self.key_layout = key_layout
+        self.mixins = mixins
+
+        # Changes whenever any mixin's keys, meta data or stroke sequences
+        # change. Hashes the stroke sequences themselves, so a library file
+        # with changed variants doesn't load.
+        version = hashlib.sha1(repr(layout_id(key_layout)).encode())
+        for keys, mixin in mixins:
+            version.update(repr((keys, mixin.change_side, mixin.version,
+                list(mixin.variants))).encode())
+        self.version = version.hexdigest()
+
+    # Snapshot of all the mixins of a built dictionary.
+    @classmethod
+    def from_dictionary(cls, dictionary):
+        keys = {}
+        for key, mixin in dictionary.mixins.items():
+            keys.setdefault(id(mixin), ([], mixin))[0].append(key)
+
+        return cls(dictionary.key_layout, list(keys.values()))
+
+    # Replaces the mixins of dictionary with copies of the library's, it
+    # should be called before any entries are added.
+    def apply(self, dictionary):
+        if layout_id(dictionary.key_layout) != layout_id(self.key_layout):
+            raise ValueError("Mixin library key layout doesn't match the dictionary")
+
+        dictionary.mixins = {}
+        for keys, mixin in self.mixins:
+            copy = Mixin(mixin.change_side)
+            copy.variants = dict(mixin.variants)
+            for key in keys:
+                dictionary.mixins[key] = copy
+        dictionary.parse_cache.clear()
+
+    def save(self, path):
+        with open(path, "w", encoding = "utf-8") as library_file:
+            library_file.write(json.dumps({
+                    "format_version": MixinLibrary.format_version,
+                    "key_layout": layout_id(self.key_layout),
+                    "version": self.version,
+                    "mixins": [{
+                            "keys": keys,
+                            "change_side": mixin.change_side,
+                            "version": mixin.version,
+                            "variants": list(mixin.stroke_sequence_keys())}
+                        for keys, mixin in self.mixins]},
+                ensure_ascii = False,
+                separators = (',', ':')))
+
+    # Raises ValueError if the file isn't a mixin library for key_layout.
+    @classmethod
+    def load(cls, path, key_layout):
+        with open(path, encoding = "utf-8") as library_file:
+            data = json.load(library_file)
+
+        format_version = data.get("format_version") if isinstance(data, dict) else None
+        if not isinstance(format_version, int):
+            raise ValueError(path + " is not a mixin library")
+        if format_version != MixinLibrary.format_version:
+            raise ValueError("Mixin library " + path
+                + " has an unsupported format version, save it again with"
+                + " --save-mixin-library")
+        if data.get("key_layout") != layout_id(key_layout):
+            raise ValueError("Mixin library " + path
+                + " was built for a different key layout")
+
+        try:
+            mixins = []
+            for item in data["mixins"]:
+                mixin = Mixin(item["change_side"])
+                for keys in item["variants"]:
+                    keys = tuple(keys)
+                    mixin.variants[keys] = StrokeSequence.from_keys(key_layout, keys)
+                if mixin.version != item["version"]:
+                    raise ValueError("Mixin library " + path + " is corrupt")
+                mixins.append((item["keys"], mixin))
+
+            library = cls(key_layout, mixins)
+        except (KeyError, TypeError):
+            library = None
+        if library is None or library.version != data.get("version"):
+            raise ValueError("Mixin library " + path + " is corrupt")
+
+        return library
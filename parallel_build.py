@@ -0,0 +1,184 @@
+import re
+import os
+import multiprocessing
+
+from advanced_translation import AdvancedTranslation
+from build_cache import BuildRecord
+from advanced_steno_dictionary import entry_stroke_sequences
+from permutate import BuildableOptionGroup, permutate_tree_indices
+from util import double_quote_str
+
+
+# Dictionary used by worker processes, inherited from the parent process
+# when the pool is forked.
+_worker_dictionary = None
+
+def _expand_entry(task):
+    translation_str, ss_strs = task
+
+    record = BuildRecord()
+    success = _worker_dictionary.add_entry(
+        translation_str, ss_strs, record, deferred = True)
+
+    return success, record
+
+def _translation_strings(translation):
+    permutations = permutate_tree_indices(translation)
+    if len(permutations) == 0:
+        permutations = [()]
+
+    return [translation.lookup(indices) for indices in permutations]
+
+# Strings of every option (and sub-option) of a translation's option groups,
+# these can be used as mixins by empty stroke sequence options.
+def _option_strings(translation):
+    strings = []
+    for part in translation:
+        if isinstance(part, BuildableOptionGroup):
+            for option in part:
+                strings += _translation_strings(option)
+                strings += _option_strings(option)
+
+    return strings
+
+# Mixin names (without side) which could be defined by the entry.
+def _defined_names(translation):
+    names = set()
+    if not translation.is_mixin:
+        return names
+
+    for string in _translation_strings(translation):
+        names.add(double_quote_str(string))
+        if re.match(r"[a-zA-Z][a-zA-Z ]*$", string):
+            names.add(string.lower().replace(" ", "_"))
+
+    return names
+
+# Mixin names (without side) which could be referenced by the entry.
+def _referenced_names(dictionary, translation, ss_strs):
+    names = set()
+    for ss_str in ss_strs:
+        for part_str in dictionary.advanced_ss_pattern.findall(ss_str):
+            if part_str.isspace() \
+                    or part_str in ("&", "^", "]", ",") \
+                    or part_str[:1] == "[":
+                continue
+            names.add(dictionary.mixin_key(part_str, 1))
+
+        if "[" in ss_str:
+            for string in _option_strings(translation):
+                names.add(double_quote_str(string))
+
+    return names
+
+# Processes entries using a pool of processes, giving the same result as
+# AdvancedStenoDictionary.add_entries.
+#
+# Entries which define mixins referenced by other entries are processed
+# in order first. The remaining entries only depend on mixins which are
+# complete by then, so they're expanded in parallel. Entry outputs and
+# errors are applied in source order so conflict reporting is unchanged.
+def add_entries_parallel(dictionary, entries, processes = None, build_cache = None):
+    global _worker_dictionary
+
+    entries = [(translation_str,
+            [ss_strs] if isinstance(ss_strs, str) else ss_strs)
+        for translation_str, ss_strs in entries]
+
+    referenced = []
+    all_referenced = set()
+    defined = []
+    for translation_str, ss_strs in entries:
+        translation = AdvancedTranslation(translation_str)
+        names = _referenced_names(dictionary, translation,
+            entry_stroke_sequences(ss_strs) or [])
+        referenced.append(names)
+        all_referenced |= names
+        defined.append(_defined_names(translation))
+
+    last_definition = {}
+    is_serial = [False] * len(entries)
+    for i in range(0, len(entries)):
+        if not defined[i].isdisjoint(all_referenced):
+            is_serial[i] = True
+            for name in defined[i]:
+                last_definition[name] = i
+
+    # Entries using mixins which are (re)defined later must see the mixins
+    # as they are at that point, so they can't be deferred.
+    for i in range(0, len(entries)):
+        if not is_serial[i]:
+            for name in referenced[i]:
+                if last_definition.get(name, -1) > i:
+                    is_serial[i] = True
+                    break
+
+    records = [None] * len(entries)
+    for i in range(0, len(entries)):
+        if not is_serial[i]:
+            continue
+
+        translation_str, ss_strs = entries[i]
+        if build_cache is not None:
+            records[i] = build_cache.lookup(dictionary, translation_str, ss_strs)
+            if records[i] is not None:
+                records[i].replay(dictionary, translation_str, entries = False)
+                continue
+
+        records[i] = BuildRecord()
+        if dictionary.add_entry(translation_str, ss_strs, records[i], deferred = True) \
+                and build_cache is not None:
+            build_cache.store(translation_str, ss_strs, records[i])
+
+    tasks = []
+    for i in range(0, len(entries)):
+        if is_serial[i]:
+            continue
+
+        translation_str, ss_strs = entries[i]
+        if build_cache is not None:
+            records[i] = build_cache.lookup(dictionary, translation_str, ss_strs)
+        if records[i] is None:
+            tasks.append(i)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    _worker_dictionary = dictionary
+    if processes > 1 and len(tasks) > 0 \
+            and "fork" in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context("fork").Pool(processes)
+        results = pool.imap(_expand_entry,
+            [entries[i] for i in tasks],
+            chunksize = max(1, min(256, len(tasks) // (processes * 4))))
+    else:
+        # Expanded in this process, mixins will already have been added.
+        pool = None
+        results = map(_expand_entry, [entries[i] for i in tasks])
+
+    try:
+        results = iter(results)
+        task_i = 0
+        for i in range(0, len(entries)):
+            translation_str, ss_strs = entries[i]
+
+            if is_serial[i]:
+                records[i].replay(dictionary, translation_str, mixins = False)
+                continue
+
+            if task_i < len(tasks) and tasks[task_i] == i:
+                task_i += 1
+                success, records[i] = next(results)
+                if success and build_cache is not None:
+                    build_cache.store(translation_str, ss_strs, records[i])
+
+                records[i].replay(dictionary, translation_str,
+                    mixins = pool is not None)
+            else:
+                records[i].replay(dictionary, translation_str)
+            records[i] = None
+    finally:
+        _worker_dictionary = None
+        if pool is not None:
+            pool.close()
+            pool.join()
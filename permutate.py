@@ -1,13 +1,14 @@
-import copy
-from collections import Sequence
+from collections.abc import Sequence
 from abc import ABCMeta
 
 
 class PartsList(Sequence):
     __metaclass__ = ABCMeta
+    __slots__ = ()
 
 class OptionGroup(Sequence):
     __metaclass__ = ABCMeta
+    __slots__ = ()
 
 PartsList.register(list)
 PartsList.register(tuple)
@@ -17,8 +18,9 @@ OptionGroup.register(tuple)
 
 
 class OptionGroupStack:
-    def __init__(self, option_group_object):
-        self.option_group_object = option_group_object
+    # new_option_group - Returns a new, empty option group.
+    def __init__(self, new_option_group):
+        self.new_option_group = new_option_group
         self.stack = []
         self.begin_group()
 
@@ -29,7 +31,7 @@ class OptionGroupStack:
         return self.stack[i]
 
     def begin_group(self):
-        self.stack.append(copy.deepcopy(self.option_group_object))
+        self.stack.append(self.new_option_group())
 
     def end_group(self):
         complete_group = self.stack.pop()
@@ -46,8 +48,11 @@ class OptionGroupStack:
         return self.stack[0][0]
 
 class BuildableOptionGroup(OptionGroup):
-    def __init__(self, option_object):
-        self.option_object = option_object
+    __slots__ = ("new_option", "options")
+
+    # new_option - Returns a new, empty option (parts list).
+    def __init__(self, new_option):
+        self.new_option = new_option
         self.options = []
         self.add_option()
 
@@ -58,7 +63,7 @@ class BuildableOptionGroup(OptionGroup):
         return self.options[i]
 
     def add_option(self):
-        self.options.append(copy.deepcopy(self.option_object))
+        self.options.append(self.new_option())
 
     def add_part(self, part):
         self.options[-1].add_part(part)
@@ -123,6 +128,13 @@ def permutate_indices(container):
                 break
 
 def permutate_tree_indices(options_tree):
+    permutations = list(iter_tree_indices(options_tree))
+
+    return [] if permutations == [()] else permutations
+
+# Lazy version of permutate_tree_indices, but yields a single empty
+# permutation if there are no option groups.
+def iter_tree_indices(options_tree):
     options_flat = []
     for option_tree in options_tree:
         if isinstance(option_tree, OptionGroup):
@@ -141,7 +153,10 @@ def permutate_tree_indices(options_tree):
 
             options_flat.append(option_flat)
 
-    return [x for x in permutate(options_flat)]
+    if len(options_flat) == 0:
+        yield ()
+    else:
+        yield from permutate(options_flat)
 
 def lookup_tree_sequence(options_tree, choice_tree):
     value = []
@@ -0,0 +1,64 @@
+from plover.steno_dictionary import StenoDictionary
+
+from stroke import KeyLayout, DEFAULT_LAYOUT
+from compiled_dictionary import CompiledDictionary
+
+
+# Read only Plover dictionary loading advanced dictionary sources through a
+# CompiledDictionary, so the source is only compiled when it changes and
+# lookups search the memory mapped compiled dictionary.
+#
+# To use it, register the class with Plover's plugin registry as the
+# dictionary format of a file extension (such as "asd") used by the sources,
+# see the README.
+class AdvancedPloverDictionary(StenoDictionary):
+    readonly = True
+
+    # Key layout of the sources, see KeyLayout.from_string
+    key_layout_spec = DEFAULT_LAYOUT
+
+    def __init__(self):
+        super().__init__()
+        self.key_layout = KeyLayout.from_string(self.key_layout_spec)
+        self.compiled = None
+
+    def _load(self, filename):
+        compiled = CompiledDictionary(self.key_layout, filename)
+        if self.compiled is not None:
+            self.compiled.close()
+        self.compiled = compiled
+        self._longest_key = compiled.longest_key
+
+    def __del__(self):
+        if self.compiled is not None:
+            self.compiled.close()
+
+    def __len__(self):
+        return len(self.compiled)
+
+    def __iter__(self):
+        return self.compiled.keys()
+
+    def keys(self):
+        return self.compiled.keys()
+
+    def values(self):
+        return self.compiled.values()
+
+    def items(self):
+        return self.compiled.items()
+
+    def get(self, key, fallback = None):
+        return self.compiled.get(key, fallback)
+
+    def __getitem__(self, key):
+        return self.compiled[key]
+
+    def __contains__(self, key):
+        return key in self.compiled
+
+    def reverse_lookup(self, value):
+        return self.compiled.reverse_lookup(value)
+
+    def casereverse_lookup(self, value):
+        return self.compiled.casereverse_lookup(value)
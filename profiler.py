@@ -0,0 +1,174 @@
+import time
+
+from permutate import iter_tree_indices
+
+
+class EntryProfile:
+    def __init__(self, translation_str):
+        self.translation_str = translation_str
+        self.seconds = 0.0
+        self.translation_parse_seconds = 0.0
+        self.parse_seconds = 0.0
+        # Making the translation's permutations and their simple translations
+        self.permutation_seconds = 0.0
+        self.expansion_seconds = 0.0
+        # Stroke sequence combinations made while expanding
+        self.combinations = 0
+        # Stroke sequences created by expansions
+        self.sequences = 0
+
+class MixinProfile:
+    def __init__(self):
+        self.seconds = 0.0
+        # Stroke sequences added to the mixin (including duplicates)
+        self.sequences = 0
+        # Stroke sequence combinations made with the mixin's variants
+        self.combinations = 0
+
+# Collects per source entry and per mixin build costs. Set as
+# AdvancedStenoDictionary.profiler to enable.
+class BuildProfiler:
+    clock = time.perf_counter
+
+    def __init__(self):
+        # source entry index -> EntryProfile
+        self.entries = {}
+        # mixin key -> MixinProfile
+        self.mixins = {}
+
+        self.entry = None
+        self.entry_start = 0.0
+
+        # (hits, misses) of the build cache, if one was used
+        self.build_cache = None
+
+    # index is the entry's position in the source, if None the entry is
+    # numbered after the entries profiled so far.
+    def begin_entry(self, index, translation_str):
+        if index is None:
+            index = len(self.entries)
+        self.entry = self.entries.get(index)
+        if self.entry is None:
+            self.entry = EntryProfile(translation_str)
+            self.entries[index] = self.entry
+        self.entry_start = BuildProfiler.clock()
+
+    def end_entry(self):
+        self.entry.seconds += BuildProfiler.clock() - self.entry_start
+        self.entry = None
+
+    def add_translation_parse(self, seconds):
+        if self.entry is not None:
+            self.entry.translation_parse_seconds += seconds
+
+    def add_parse(self, seconds):
+        if self.entry is not None:
+            self.entry.parse_seconds += seconds
+
+    def add_permutation(self, seconds):
+        if self.entry is not None:
+            self.entry.permutation_seconds += seconds
+
+    # Yields the selection trees of translation's permutations, adding the
+    # time spent making them to the entry's permutation time.
+    def iter_tree_indices(self, translation):
+        clock = BuildProfiler.clock
+        permutations = iter_tree_indices(translation)
+        while True:
+            start = clock()
+            indices = next(permutations, None)
+            self.add_permutation(clock() - start)
+            if indices is None:
+                return
+            yield indices
+
+    def add_expansion(self, seconds, sequences):
+        if self.entry is not None:
+            self.entry.expansion_seconds += seconds
+            self.entry.sequences += sequences
+
+    def add_combinations(self, combinations):
+        if self.entry is not None:
+            self.entry.combinations += combinations
+
+    def _mixin(self, key):
+        mixin = self.mixins.get(key)
+        if mixin is None:
+            mixin = MixinProfile()
+            self.mixins[key] = mixin
+
+        return mixin
+
+    def add_mixin_combinations(self, key, combinations):
+        self._mixin(key).combinations += combinations
+
+    def add_build_cache(self, hits, misses):
+        self.build_cache = (hits, misses)
+
+    def add_mixin(self, key, seconds, sequences):
+        mixin = self._mixin(key)
+        mixin.seconds += seconds
+        mixin.sequences += sequences
+
+    def top_entries(self, count):
+        return sorted(self.entries.items(),
+            key = lambda item: -item[1].seconds)[:count]
+
+    def top_mixins(self, count):
+        return sorted(self.mixins.items(),
+            key = lambda item: (-item[1].combinations, -item[1].seconds))[:count]
+
+    def to_json(self, count):
+        report = {
+            "entries": [{
+                    "index": index,
+                    "entry": entry.translation_str,
+                    "seconds": entry.seconds,
+                    "translation_parse_seconds": entry.translation_parse_seconds,
+                    "parse_seconds": entry.parse_seconds,
+                    "permutation_seconds": entry.permutation_seconds,
+                    "expansion_seconds": entry.expansion_seconds,
+                    "combinations": entry.combinations,
+                    "sequences": entry.sequences}
+                for index, entry in self.top_entries(count)],
+            "mixins": [{
+                    "mixin": key,
+                    "seconds": mixin.seconds,
+                    "sequences": mixin.sequences,
+                    "combinations": mixin.combinations}
+                for key, mixin in self.top_mixins(count)]}
+        if self.build_cache is not None:
+            report["build_cache"] = {
+                "hits": self.build_cache[0],
+                "misses": self.build_cache[1]}
+
+        return report
+
+    def report(self, count):
+        lines = ["seconds\tparse\texpansion\tcombinations\tsequences\tindex\tentry"]
+        for index, entry in self.top_entries(count):
+            lines.append("%.6f\t%.6f\t%.6f\t%d\t%d\t%d\t%s" % (
+                entry.seconds,
+                entry.parse_seconds,
+                entry.expansion_seconds,
+                entry.combinations,
+                entry.sequences,
+                index,
+                entry.translation_str))
+
+        lines.append("")
+        lines.append("combinations\tseconds\tsequences\tmixin")
+        for key, mixin in self.top_mixins(count):
+            lines.append("%d\t%.6f\t%d\t%s" % (
+                mixin.combinations,
+                mixin.seconds,
+                mixin.sequences,
+                key))
+
+        if self.build_cache is not None:
+            hits, misses = self.build_cache
+            lines.append("")
+            lines.append("build cache: %d hits, %d misses (%.1f%% hit rate)" % (
+                hits, misses, 100.0 * hits / max(1, hits + misses)))
+
+        return "\n".join(lines)
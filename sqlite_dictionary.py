@@ -0,0 +1,89 @@
+import json
+import sqlite3
+
+from advanced_stroke_sequence import ParseError
+
+
+_schema = """
+    CREATE TABLE IF NOT EXISTS entries (
+        strokes TEXT PRIMARY KEY,
+        translation TEXT NOT NULL);
+    CREATE INDEX IF NOT EXISTS entries_translation ON entries (translation);
+    CREATE TABLE IF NOT EXISTS entry_sources (
+        strokes TEXT PRIMARY KEY REFERENCES entries (strokes) ON DELETE CASCADE,
+        source_translation TEXT NOT NULL,
+        source_strokes TEXT NOT NULL,
+        -- JSON list of the mixin keys used by the source strokes
+        mixins TEXT NOT NULL);
+    CREATE INDEX IF NOT EXISTS entry_sources_source
+        ON entry_sources (source_translation);
+"""
+
+# Mixin keys JSON of the source entry (translation_str, ss_str) an entry was
+# built from.
+def _source_mixins(dictionary, source):
+    try:
+        return json.dumps(
+            dictionary.stroke_sequence_mixin_keys(*source),
+            ensure_ascii = False)
+    except (ParseError, LookupError):
+        return "[]"
+
+# Writes the entries of dictionary to a SQLite database at path, along with
+# the source entry and mixins each entry was built from. dictionary must have
+# been built with entry_sources set to a dict.
+#
+# If the database already exists, entries are compared by key with the
+# stored rows, and only rows whose translation or source entry changed are
+# written (their mixins are only worked out then). Rows for entries which no
+# longer exist are deleted, all in one transaction.
+# Returns (written row count, deleted row count).
+def write_sqlite_dictionary(path, dictionary):
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.executescript(_schema)
+
+        existing = {}
+        for row in connection.execute(
+                "SELECT entries.strokes, translation, source_translation, "
+                "source_strokes "
+                "FROM entries LEFT JOIN entry_sources USING (strokes)"):
+            existing[row[0]] = row[1:]
+
+        mixins = {}
+        changed = []
+        for key_str, translation in dictionary.entries.items():
+            source = dictionary.entry_sources.get(key_str, ("", ""))
+            row = (translation,) + source
+            if existing.pop(key_str, None) == row:
+                continue
+
+            source_mixins = mixins.get(source)
+            if source_mixins is None:
+                source_mixins = _source_mixins(dictionary, source)
+                mixins[source] = source_mixins
+            changed.append((key_str,) + row + (source_mixins,))
+        # Entries left over no longer exist
+        removed = [(key_str,) for key_str in existing]
+
+        with connection:
+            connection.executemany(
+                "DELETE FROM entries WHERE strokes = ?", removed)
+            connection.executemany(
+                "INSERT INTO entries (strokes, translation) VALUES (?, ?) "
+                "ON CONFLICT (strokes) DO UPDATE SET translation = excluded.translation",
+                [row[:2] for row in changed])
+            connection.executemany(
+                "INSERT INTO entry_sources "
+                "(strokes, source_translation, source_strokes, mixins) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (strokes) DO UPDATE SET "
+                "source_translation = excluded.source_translation, "
+                "source_strokes = excluded.source_strokes, "
+                "mixins = excluded.mixins",
+                [(row[0],) + row[2:] for row in changed])
+    finally:
+        connection.close()
+
+    return len(changed), len(removed)
@@ -0,0 +1,162 @@
+import re
+import json
+import heapq
+import tempfile
+
+
+class _JsonStream:
+    whitespace_pattern = re.compile(r"\s*")
+
+    def __init__(self, json_file, chunk_size):
+        self.json_file = json_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder(object_pairs_hook = tuple)
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def read(self):
+        chunk = self.json_file.read(self.chunk_size)
+        if len(chunk) == 0:
+            self.eof = True
+
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def skip_whitespace(self):
+        while True:
+            self.position = _JsonStream.whitespace_pattern.match(
+                self.buffer, self.position).end()
+            if self.position < len(self.buffer) or self.eof:
+                return
+            self.read()
+
+    def expect(self, characters):
+        self.skip_whitespace()
+
+        if self.position == len(self.buffer):
+            raise ValueError("Unexpected end of JSON input")
+
+        character = self.buffer[self.position]
+        if character not in characters:
+            raise ValueError("Expected one of " + repr(characters)
+                + " but found " + repr(character))
+        self.position += 1
+
+        return character
+
+    def peek(self):
+        self.skip_whitespace()
+
+        return self.buffer[self.position:self.position+1]
+
+    def value(self):
+        self.skip_whitespace()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # Numbers and literals could continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.read()
+
+# Yields the (key, value) pairs of a JSON object file one at a time, without
+# loading the whole file. Nested objects are decoded as tuples of pairs, the
+# same as json.load(..., object_pairs_hook=tuple).
+def iter_json_object(json_file, chunk_size = 1 << 16):
+    stream = _JsonStream(json_file, chunk_size)
+
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        key = stream.value()
+        if not isinstance(key, str):
+            raise ValueError("JSON object keys must be strings")
+        stream.expect(":")
+
+        yield (key, stream.value())
+
+        if stream.expect(",}") == "}":
+            return
+
+def _iter_run(run_file):
+    for line in run_file:
+        yield tuple(json.loads(line))
+
+# Writes dictionary entries as a JSON object sorted by key, the same as
+# json.dump(..., sort_keys = True, indent = 0, separators = (',', ': ')).
+# Once more than buffer_size entries have been added, sorted runs of entries
+# are written to temporary files and merged when the output is written.
+#
+# Entries with the same key are resolved as they would be in a dict, the
+# last one added is kept. conflict is called as
+# conflict(translation_str, ss_str, key_str, existing_translation) for every
+# replaced entry, in key order.
+class SortedEntryWriter:
+    def __init__(self, out_file, buffer_size = 100000, conflict = None):
+        self.out_file = out_file
+        self.buffer_size = buffer_size
+        self.conflict = conflict
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def add(self, key_str, simple_translation, translation_str = "", ss_str = ""):
+        self.buffer.append(
+            (key_str, self.count, simple_translation, translation_str, ss_str))
+        self.count += 1
+
+        if len(self.buffer) >= self.buffer_size:
+            self._write_run()
+
+    def _write_run(self):
+        self.buffer.sort()
+
+        run_file = tempfile.TemporaryFile("w+", encoding = "utf-8")
+        for item in self.buffer:
+            run_file.write(json.dumps(item, ensure_ascii = False))
+            run_file.write("\n")
+        run_file.seek(0)
+
+        self.runs.append(run_file)
+        self.buffer = []
+
+    def _merged_entries(self):
+        self.buffer.sort()
+        items = heapq.merge(
+            *[_iter_run(run_file) for run_file in self.runs],
+            iter(self.buffer))
+
+        previous = None
+        for item in items:
+            if previous is not None and previous[0] != item[0]:
+                yield previous
+            elif previous is not None and self.conflict is not None:
+                self.conflict(item[3], item[4], item[0], previous[2])
+            previous = item
+
+        if previous is not None:
+            yield previous
+
+    def close(self):
+        separator = "{\n"
+        for item in self._merged_entries():
+            self.out_file.write(separator)
+            self.out_file.write(json.dumps(item[0], ensure_ascii = False))
+            self.out_file.write(": ")
+            self.out_file.write(json.dumps(item[2], ensure_ascii = False))
+            separator = ",\n"
+
+        self.out_file.write("{}" if separator == "{\n" else "\n}")
+
+        for run_file in self.runs:
+            run_file.close()
+        self.runs = []
+        self.buffer = []
@@ -1,48 +1,143 @@
-import copy
+import json
 
-class KeyLayout:
-    def __init__(self):
-        keys = []
-        break_keys = (0, 0)
+from util import LRUCache
+
+
+# English steno layout, as left|middle|right keys
+DEFAULT_LAYOUT = "STKPWHR|AO*EU|FRPBLGTSDZ"
 
+class KeyLayout:
+    # Maximum number of distinct strokes remembered by the per-layout
+    # stroke string render and parse caches.
+    cache_size = 1 << 16
+
+    # keys - All keys in steno order.
+    # break_keys - Index of the first middle key and the first right key.
+    def __init__(self, keys = "", break_keys = (0, 0)):
+        self.keys = keys
+        self.break_keys = break_keys
+
+        # stroke keys bitmask -> stroke string
+        self.render_cache = LRUCache(KeyLayout.cache_size)
+        # stroke string -> stroke keys bitmask
+        self.parse_cache = LRUCache(KeyLayout.cache_size)
+
+        # Per side key character -> [key index], indexed by side as used by
+        # mixins: 0 - middle (usable from either side), 1 - left, 2 - right.
+        self.key_positions = ({}, {}, {})
+        for i in range(0, len(keys)):
+            if i < break_keys[0]:
+                side = 1
+            elif i >= break_keys[1]:
+                side = 2
+            else:
+                side = 0
+            self.key_positions[side].setdefault(keys[i], []).append(i)
+
+        # Parse table, next_positions[j] maps each key character to the index
+        # of its first key at or after index j. The "-" divider maps to the
+        # first right key, before the right keys.
+        self.next_positions = [None] * (len(keys) + 1)
+        next_position = {}
+        for j in range(len(keys), -1, -1):
+            if j < len(keys):
+                next_position[keys[j]] = j
+            self.next_positions[j] = dict(next_position)
+            if j < break_keys[1] and "-" not in keys:
+                self.next_positions[j]["-"] = None
+
+    # Layout from its keys on each side, e.g. "STKPWHR|AO*EU|FRPBLGTSDZ".
+    @classmethod
+    def from_string(cls, layout_string):
+        sides = layout_string.split("|")
+        if len(sides) != 3:
+            raise ValueError("Key layouts must have left, middle and right keys "
+                "separated by |: " + layout_string)
+
+        return cls.from_sides(*sides)
+
+    @classmethod
+    def from_sides(cls, left, middle, right):
+        keys = left + middle + right
+        if "/" in keys or "-" in keys:
+            raise ValueError("Key layouts can't use / or - as keys")
+
+        return cls(keys, (len(left), len(left) + len(middle)))
+
+    # Layout from a JSON file of the form
+    # {"left": "STKPWHR", "middle": "AO*EU", "right": "FRPBLGTSDZ"}
+    @classmethod
+    def load(cls, path):
+        with open(path) as layout_file:
+            definition = json.load(layout_file)
+
+        try:
+            return cls.from_sides(
+                definition["left"], definition["middle"], definition["right"])
+        except (KeyError, TypeError) as e:
+            raise ValueError("Bad key layout file " + path + ": " + str(e))
+
+# Immutable, add and remove return a new stroke.
 class Stroke:
+    __slots__ = ("key_layout", "keys")
+
     def __init__(self, key_layout, stroke_string = ""):
         self.key_layout = key_layout
-        self.keys = [False] * len(key_layout.keys)
+        # Bitmask of pressed keys, bit i is set if key_layout.keys[i] is
+        # pressed.
+        self.keys = key_layout.parse_cache.get(stroke_string)
+
+        if self.keys is None:
+            self.keys = Stroke._parse(key_layout, stroke_string)
+            key_layout.parse_cache[stroke_string] = self.keys
+
+    @staticmethod
+    def _parse(key_layout, stroke_string):
+        next_positions = key_layout.next_positions
+        keys = 0
 
-        i = 0
         j = 0
-        while i < len(stroke_string) and j < len(key_layout.keys):
-            if stroke_string[i] == key_layout.keys[j]:
-                i += 1
-                self.keys[j] = True
-            elif stroke_string[i] == "-" and j < key_layout.break_keys[1]:
-                i += 1
-                j = key_layout.break_keys[1] - 1
+        for character in stroke_string:
+            position = next_positions[j].get(character, -1)
+            if position is None:
+                # Divider, continue from the first right key
+                j = key_layout.break_keys[1]
+            elif position < 0:
+                # Bad stroke_string (not ordered properly or invalid keys)
+                return 0
+            else:
+                keys |= 1 << position
+                j = position + 1
 
-            j += 1
+        return keys
 
-        # Bad stroke_string (not ordered properly or invalid keys
-        if i < len(stroke_string):
-            self.keys = [False] * len(key_layout.keys)
+    @classmethod
+    def from_keys(cls, key_layout, keys):
+        stroke = cls.__new__(cls)
+        stroke.key_layout = key_layout
+        stroke.keys = keys
 
-    def add(self, stroke):
-        self.keys = [self.keys[i] or stroke.keys[i]
-            for i in range(0, len(stroke.keys))]
+        return stroke
 
-        return self
+    def __eq__(self, other):
+        return isinstance(other, Stroke) \
+            and self.keys == other.keys \
+            and self.key_layout is other.key_layout
 
-    def remove(self, stroke):
-        self.keys = [self.keys[i] and not stroke.keys[i]
-            for i in range(0, len(stroke.keys))]
+    def __hash__(self):
+        return hash(self.keys)
 
-        return self
+    def add(self, stroke):
+        return Stroke.from_keys(self.key_layout, self.keys | stroke.keys)
+
+    def remove(self, stroke):
+        return Stroke.from_keys(self.key_layout, self.keys & ~stroke.keys)
 
     def to_string_long(self):
         stroke_string = ""
 
         for i in range(0, len(self.key_layout.keys)):
-            if self.keys[i]:
+            if self.keys & (1 << i):
                 stroke_string += self.key_layout.keys[i]
             else:
                 stroke_string += " "
@@ -50,6 +145,15 @@ class Stroke:
         return stroke_string
 
     def to_string(self):
+        stroke_string = self.key_layout.render_cache.get(self.keys)
+
+        if stroke_string is None:
+            stroke_string = self._to_string()
+            self.key_layout.render_cache[self.keys] = stroke_string
+
+        return stroke_string
+
+    def _to_string(self):
         stroke_string = self.to_string_long()
 
         need_middle_divider = True
@@ -65,32 +169,77 @@ class Stroke:
         return stroke_string
 
 
+# Immutable, combining stroke sequences returns a new stroke sequence with a
+# new tuple of stroke key bitmasks (the unchanged strokes are copied), so
+# stroke sequences can be shared instead of copied.
 class StrokeSequence:
-    def __init__(self, strokes = []):
-        self.strokes = strokes
+    __slots__ = ("key_layout", "keys")
 
-    def add(self, stroke_sequence):
-        self.strokes[-1].add(stroke_sequence.strokes[0])
-        self.strokes += stroke_sequence.strokes[1:]
+    def __init__(self, strokes = ()):
+        self.key_layout = strokes[0].key_layout if len(strokes) > 0 else None
+        # Tuple of stroke key bitmasks
+        self.keys = tuple(stroke.keys for stroke in strokes)
 
-        return self
+    @classmethod
+    def from_keys(cls, key_layout, keys):
+        stroke_sequence = cls.__new__(cls)
+        stroke_sequence.key_layout = key_layout
+        stroke_sequence.keys = tuple(keys)
 
-    def remove(self, stroke_sequence):
-        self.strokes[-1].remove(stroke_sequence.strokes[0])
-        self.strokes += stroke_sequence.strokes[1:]
+        return stroke_sequence
 
-        return self
+    def __len__(self):
+        return len(self.keys)
+
+    def __eq__(self, other):
+        return isinstance(other, StrokeSequence) \
+            and self.keys == other.keys \
+            and self.key_layout is other.key_layout
+
+    def __hash__(self):
+        return hash(self.keys)
+
+    @property
+    def strokes(self):
+        return tuple(Stroke.from_keys(self.key_layout, stroke_keys)
+            for stroke_keys in self.keys)
+
+    def add(self, stroke_sequence):
+        return StrokeSequence.from_keys(self.key_layout,
+            self.keys[:-1]
+                + (self.keys[-1] | stroke_sequence.keys[0],)
+                + stroke_sequence.keys[1:])
+
+    def remove(self, stroke_sequence):
+        return StrokeSequence.from_keys(self.key_layout,
+            self.keys[:-1]
+                + (self.keys[-1] & ~stroke_sequence.keys[0],)
+                + stroke_sequence.keys[1:])
 
     def combine(self, stroke_sequence, action):
         if action == 0:
-            self.add(stroke_sequence)
+            return self.add(stroke_sequence)
         else:
-            self.remove(stroke_sequence)
+            return self.remove(stroke_sequence)
 
+    def copy(self):
         return self
 
-    def copy(self):
-        return StrokeSequence([copy.copy(stroke) for stroke in self.strokes])
+    def to_keys(self):
+        return self.keys
 
     def to_string(self):
-        return "/".join([stroke.to_string() for stroke in self.strokes])
+        render_cache = self.key_layout.render_cache
+        stroke_strings = []
+        for stroke_keys in self.keys:
+            stroke_string = render_cache.get(stroke_keys)
+            if stroke_string is None:
+                stroke_string = Stroke.from_keys(self.key_layout, stroke_keys).to_string()
+            stroke_strings.append(stroke_string)
+
+        return "/".join(stroke_strings)
+
+# Tuple of stroke key bitmasks for a stroke sequence string (e.g. "TRAPBLG/EUBG").
+def stroke_sequence_keys(key_layout, stroke_sequence_string):
+    return tuple(Stroke(key_layout, stroke_string).keys
+        for stroke_string in stroke_sequence_string.split("/"))
@@ -0,0 +1,107 @@
+class _StrokeTrieNode:
+    def __init__(self):
+        # Translation of the stroke sequence ending at this node, or None
+        self.translation = None
+        # stroke key bitmask -> _StrokeTrieNode
+        self.children = {}
+
+# Index of dictionary entries keyed by stroke, one level per stroke.
+class StrokeTrie:
+    def __init__(self):
+        self.root = _StrokeTrieNode()
+        self.count = 0
+        # Maximum number of strokes of an entry
+        self.longest_key = 0
+
+    def __len__(self):
+        return self.count
+
+    # keys is a sequence of stroke key bitmasks
+    def add(self, keys, translation):
+        node = self.root
+        for stroke_keys in keys:
+            child = node.children.get(stroke_keys)
+            if child is None:
+                child = _StrokeTrieNode()
+                node.children[stroke_keys] = child
+            node = child
+
+        if node.translation is None:
+            self.count += 1
+        node.translation = translation
+        self.longest_key = max(self.longest_key, len(keys))
+
+    def _node(self, keys):
+        node = self.root
+        for stroke_keys in keys:
+            node = node.children.get(stroke_keys)
+            if node is None:
+                return None
+
+        return node
+
+    def lookup(self, keys, default = None):
+        node = self._node(keys)
+        if node is None or node.translation is None:
+            return default
+
+        return node.translation
+
+    def __contains__(self, keys):
+        return self.lookup(keys) is not None
+
+    # Yields (keys, translation) for every entry starting with the strokes
+    # of prefix (including prefix itself), shortest entries first.
+    def iter_prefix(self, prefix = ()):
+        node = self._node(prefix)
+        if node is None:
+            return
+
+        level = [(tuple(prefix), node)]
+        while len(level) > 0:
+            next_level = []
+            for keys, node in level:
+                if node.translation is not None:
+                    yield keys, node.translation
+                for stroke_keys, child in node.children.items():
+                    next_level.append((keys + (stroke_keys,), child))
+            level = next_level
+
+    # Returns (stroke count, translation) of the longest entry matching the
+    # strokes starting at strokes[start], or (0, None) if there is none.
+    def longest_match(self, strokes, start = 0):
+        match = (0, None)
+
+        node = self.root
+        for i in range(start, min(len(strokes), start + self.longest_key)):
+            node = node.children.get(strokes[i])
+            if node is None:
+                break
+            if node.translation is not None:
+                match = (i + 1 - start, node.translation)
+
+        return match
+
+    # Splits a stroke stream into entries, always taking the longest match.
+    # Returns [(keys, translation)], strokes without a match are returned
+    # one at a time with a translation of None.
+    def translate(self, strokes):
+        strokes = tuple(strokes)
+        translations = []
+
+        i = 0
+        while i < len(strokes):
+            length, translation = self.longest_match(strokes, i)
+            length = max(length, 1)
+            translations.append((strokes[i:i + length], translation))
+            i += length
+
+        return translations
+
+    # Number of entries with each stroke count, index 0 is always 0.
+    def stroke_counts(self):
+        counts = [0] * (self.longest_key + 1)
+        for keys, translation in self.iter_prefix():
+            counts[len(keys)] += 1
+
+        return counts
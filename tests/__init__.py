@@ -0,0 +1,36 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+
+from stroke import KeyLayout, DEFAULT_LAYOUT
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TEST_DICT = os.path.join(ROOT, "test-dict.json")
+
+
+# Entries of the test dictionary, in source order.
+def load_test_dict():
+    with open(TEST_DICT, encoding = "utf-8") as data_file:
+        return json.load(data_file, object_pairs_hook = tuple)
+
+# Test case with logging silenced, a key layout and, if
+# temporary_directory is set, a temporary directory removed after each test.
+class DictionaryTestCase(unittest.TestCase):
+    layout_string = DEFAULT_LAYOUT
+    temporary_directory = False
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.layout = KeyLayout.from_string(self.layout_string)
+
+        if self.temporary_directory:
+            self.directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, self.directory)
+
+    def temp_path(self, name):
+        return os.path.join(self.directory, name)
@@ -0,0 +1,71 @@
+import unittest
+
+from advanced_translation import AdvancedTranslation
+from permutate import iter_tree_indices
+
+
+TRANSLATIONS = [
+    "nat",
+    "nat[s,]",
+    "a[b[c,d],e]",
+    "[{>},]{&[A,B,C]}",
+    "x[a,b]y[c,]z",
+    "[a[b,c[d,e]],f]g[h,]"]
+
+
+class AdvancedTranslationTest(unittest.TestCase):
+    def lookups(self, translation_str):
+        translation = AdvancedTranslation(translation_str)
+
+        return [(indices, translation.lookup(indices))
+            for indices in iter_tree_indices(translation)]
+
+    def test_lookup(self):
+        self.assertEqual(self.lookups("nat"), [((), "nat")])
+        self.assertEqual(self.lookups("nat[s,]"), [((0,), "nats"), ((1,), "nat")])
+        self.assertEqual(self.lookups("a[b[c,d],e]"), [
+            (((0, (0,)),), "abc"),
+            (((0, (1,)),), "abd"),
+            ((1,), "ae")])
+        self.assertEqual([value for indices, value in self.lookups("x[a,b]y[c,]z")],
+            ["xaycz", "xayz", "xbycz", "xbyz"])
+
+    def test_meta(self):
+        translation = AdvancedTranslation("{^}|mrL")
+        self.assertEqual(self.lookups("{^}|mrL"), [((), "{^}")])
+        self.assertTrue(translation.is_mixin)
+        self.assertFalse(translation.is_entry)
+        self.assertEqual(translation.mixin_side, 2)
+        self.assertEqual(translation.change_side, 1)
+
+        translation = AdvancedTranslation("a|b|e")
+        self.assertFalse(translation.is_mixin)
+        self.assertTrue(translation.is_entry)
+        self.assertEqual(translation.lookup(()), "a|b")
+
+    def test_variant_table(self):
+        for translation_str in TRANSLATIONS:
+            translation = AdvancedTranslation(translation_str)
+            permutations = list(iter_tree_indices(translation))
+
+            self.assertEqual(translation.variant_count(), len(permutations))
+            variants = translation.variants()
+            self.assertEqual(list(variants), permutations)
+            self.assertIs(translation.variants(), variants)
+
+    def test_rendered_matches_table(self):
+        max_table_size = AdvancedTranslation.max_table_size
+        for translation_str in TRANSLATIONS:
+            expected = self.lookups(translation_str)
+
+            AdvancedTranslation.max_table_size = 0
+            try:
+                translation = AdvancedTranslation(translation_str)
+                rendered = [(indices, translation.lookup(indices))
+                    for indices in iter_tree_indices(translation)]
+            finally:
+                AdvancedTranslation.max_table_size = max_table_size
+
+            self.assertEqual(rendered, expected)
+            # Too big for a table
+            self.assertIsNone(translation._variants)
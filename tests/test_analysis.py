@@ -0,0 +1,94 @@
+from tests import DictionaryTestCase
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from mixin_library import MixinLibrary
+import analysis
+from analysis import DictionaryAnalysis
+
+
+class DictionaryAnalysisTest(DictionaryTestCase):
+    def build(self, entries, mixin_library = None):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        if mixin_library is not None:
+            mixin_library.apply(dictionary)
+        dictionary.add_entries(entries)
+
+        return dictionary
+
+    def analyze(self, entries, mixin_library = None):
+        analysis = DictionaryAnalysis(self.layout, mixin_library)
+        analysis.add_entries(entries)
+
+        return analysis
+
+    def test_upper_bound(self):
+        entries = [
+            ("N|ml", "TPH"),
+            ("N|ml", "STPH"),
+            ("Aa|mR", "AEU"),
+            ("Aa|mR", "A"),
+            ("nate", "NAaT")]
+
+        self.assertEqual(self.analyze(entries).output_entries,
+            len(self.build(entries).entries))
+
+    def test_extended_base_mixin(self):
+        # "S" is a base mixin, the source adds a variant to it
+        entries = [("S|ml", "SKWR"), ("sat", "SAT")]
+
+        self.assertEqual(len(self.build(entries).entries), 2)
+        self.assertGreaterEqual(self.analyze(entries).output_entries, 2)
+
+    def test_extended_library_mixin(self):
+        library = MixinLibrary.from_dictionary(
+            self.build([("N|ml", "TPH"), ("N|ml", "STPH")]))
+        entries = [("N|ml", "TKPWH"), ("nat", "NAT"), ("net", "NET")]
+
+        built = self.build(entries, library)
+        analysis = self.analyze(entries, library)
+        self.assertEqual(len(built.entries), 6)
+        self.assertGreaterEqual(analysis.output_entries, len(built.entries))
+
+    def test_predicted_conflicts(self):
+        analysis = self.analyze([("cat", "KAT"), ("kat", "KAT")])
+
+        self.assertEqual(analysis.output_entries, 2)
+        self.assertEqual([conflict[0] for conflict in analysis.conflicts], ["KAT"])
+
+    def test_option_groups(self):
+        entries = [
+            ("cat[s,]", "KAT[-S,]"),
+            ("kats", "KATS"),
+            ("Pa|m", "PA"),
+            ("tap[s,]", "Pa-T"),
+            ("taps", "PAT")]
+
+        result = self.analyze(entries)
+        self.assertEqual(len(self.build(entries).entries), 3)
+        self.assertEqual(result.output_entries, 6)
+        self.assertEqual([conflict[0] for conflict in result.conflicts],
+            ["KATS", "PAT", "PAT"])
+        self.assertEqual(result.conflicts[0][1], ("cat[s,]", "KAT[-S,]", "cats"))
+
+    def test_estimated_once_per_binding(self):
+        single_keys = analysis._single_keys
+        calls = []
+        def counted_single_keys(ss, selection_tree):
+            calls.append(selection_tree)
+            return single_keys(ss, selection_tree)
+        analysis._single_keys = counted_single_keys
+        try:
+            # The option groups aren't bound to the strokes
+            result = self.analyze([("[a,b][c,d]", "KAT")])
+        finally:
+            analysis._single_keys = single_keys
+
+        self.assertEqual(result.entries[0].permutations, 4)
+        self.assertEqual(result.output_entries, 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(result.conflicts), 3)
+
+    def test_errors(self):
+        analysis = self.analyze([("bad", "Missing")])
+
+        self.assertEqual(len(analysis.entries[0].errors), 1)
+        self.assertEqual(analysis.output_entries, 0)
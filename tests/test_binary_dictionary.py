@@ -0,0 +1,49 @@
+import struct
+
+from tests import DictionaryTestCase, load_test_dict
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from binary_dictionary import BinaryDictionary, write_binary_dictionary
+
+
+class BinaryDictionaryTest(DictionaryTestCase):
+    temporary_directory = True
+
+    def setUp(self):
+        super().setUp()
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.add_entries(load_test_dict())
+        self.entries = dictionary.entries
+
+        self.path = self.temp_path("dict.asdb")
+        write_binary_dictionary(self.path, self.layout, self.entries)
+
+    def assertLookups(self, binary):
+        self.assertEqual(len(binary), len(self.entries))
+        self.assertEqual(dict(binary.items()), self.entries)
+
+        reverse = {}
+        for key_str, translation in self.entries.items():
+            self.assertEqual(binary.lookup(key_str), translation)
+            self.assertEqual(binary[key_str], translation)
+            reverse.setdefault(translation, []).append(key_str)
+        for translation, key_strs in reverse.items():
+            self.assertEqual(sorted(binary.reverse_lookup(translation)), sorted(key_strs))
+
+        self.assertIsNone(binary.lookup("STKPWHRAO*EUFRPBLGTS"))
+        self.assertNotIn("STKPWHRAO*EUFRPBLGTS", binary)
+        self.assertEqual(binary.reverse_lookup("not a translation"), [])
+
+    def test_lookups(self):
+        binary = BinaryDictionary(self.path)
+        self.assertLookups(binary)
+        binary.close()
+
+    def test_unsupported_version(self):
+        # Version 1 files had no reverse index
+        for version in (1, 99):
+            with open(self.path, "r+b") as out_file:
+                out_file.seek(4)
+                out_file.write(struct.pack("<I", version))
+
+            with self.assertRaisesRegex(ValueError, "rebuild it"):
+                BinaryDictionary(self.path)
@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from tests import ROOT, TEST_DICT
+from benchmark import synthetic_source
+import vectorized_expansion
+
+
+# Builds through the command line and checks every build mode writes the same
+# output (and reports the same errors) as the default build.
+class BuildModesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.sources = [TEST_DICT, cls.synthetic_source_path()]
+        cls.expected = [cls.build(source_path) for source_path in cls.sources]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    @classmethod
+    def synthetic_source_path(cls):
+        path = os.path.join(cls.directory, "synthetic.json")
+        source = synthetic_source(500, shared_prefix_rate = 0.3)
+        with open(path, "w", encoding = "utf-8") as source_file:
+            source_file.write("{\n" + ",\n".join([
+                    json.dumps(translation_str) + ": " + json.dumps(ss_strs)
+                    for translation_str, ss_strs in source])
+                + "\n}\n")
+
+        return path
+
+    # Returns (output, error lines)
+    @classmethod
+    def build(cls, source_path, *args):
+        output_path = os.path.join(cls.directory, "output.json")
+        result = subprocess.run(
+            [sys.executable, os.path.join(ROOT, "advanced-steno-dictionary.py")]
+                + list(args) + [source_path, output_path],
+            stderr = subprocess.PIPE, universal_newlines = True, check = True)
+        with open(output_path, encoding = "utf-8") as output_file:
+            output = output_file.read()
+        os.remove(output_path)
+
+        return output, result.stderr.splitlines()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def assertSameBuild(self, *args, error_order = True):
+        for source_path, (output, errors) in zip(self.sources, self.expected):
+            built_output, built_errors = self.build(source_path, *args)
+
+            self.assertEqual(built_output, output)
+            if error_order:
+                self.assertEqual(built_errors, errors)
+            else:
+                self.assertEqual(sorted(built_errors), sorted(errors))
+
+    def test_errors_reported(self):
+        # The synthetic source has conflicts, so error reporting is compared
+        self.assertGreater(len(self.expected[1][1]), 0)
+
+    def test_jobs(self):
+        self.assertSameBuild("--jobs", "2")
+
+    def test_stream(self):
+        # Conflicts are reported in stroke order when streaming
+        self.assertSameBuild("--stream", error_order = False)
+        self.assertSameBuild("--stream", "--stream-buffer", "50", error_order = False)
+
+    def test_cache(self):
+        for source_path, (output, errors) in zip(self.sources, self.expected):
+            cache_path = self.path("cache.json")
+            # Cold, then warm cache
+            for i in range(0, 2):
+                built_output, built_errors = self.build(source_path, "--cache", cache_path)
+                self.assertEqual(built_output, output)
+                self.assertEqual(built_errors, errors)
+
+            # Only entries which had errors are built again
+            profile_path = self.path("profile.json")
+            self.build(source_path, "--cache", cache_path,
+                "--profile", "1", "--profile-output", profile_path)
+            with open(profile_path) as profile_file:
+                build_cache = json.load(profile_file)["build_cache"]
+            with open(source_path) as source_file:
+                entry_count = len(json.load(source_file, object_pairs_hook = list))
+            self.assertEqual(build_cache["hits"] + build_cache["misses"], entry_count)
+            self.assertGreater(build_cache["hits"], build_cache["misses"])
+
+            os.remove(cache_path)
+            os.remove(profile_path)
+
+    @unittest.skipIf(not vectorized_expansion.available(), "NumPy isn't installed")
+    def test_vectorize(self):
+        self.assertSameBuild("--vectorize")
+
+    def test_mixin_library(self):
+        for source_path, (output, errors) in zip(self.sources, self.expected):
+            library_path = self.path("library.json")
+            self.build(source_path, "--save-mixin-library", library_path)
+
+            built_output, built_errors = self.build(source_path,
+                "--mixin-library", library_path)
+            self.assertEqual(built_output, output)
+            os.remove(library_path)
+
+    def test_serve_rejects_outputs(self):
+        socket_path = self.path("socket")
+        for args in (
+                [self.path("output.json")],
+                ["--binary-output", self.path("output.asdb")],
+                ["--sqlite-output", self.path("output.sqlite")],
+                ["--save-mixin-library", self.path("library.json")],
+                ["--profile", "1"],
+                ["--mixin-stats", "1"]):
+            result = subprocess.run(
+                [sys.executable, os.path.join(ROOT, "advanced-steno-dictionary.py"),
+                    "--serve", socket_path, TEST_DICT] + args,
+                stderr = subprocess.PIPE, universal_newlines = True,
+                timeout = 60)
+            self.assertEqual(result.returncode, 2)
+            self.assertIn("--serve can't be used", result.stderr)
+            self.assertFalse(os.path.exists(socket_path))
@@ -0,0 +1,109 @@
+import os
+import glob
+import shutil
+import unittest
+
+from tests import DictionaryTestCase, TEST_DICT
+from compiled_dictionary import CompiledDictionary
+
+try:
+    import plover
+except ImportError:
+    plover = None
+
+
+class CompiledDictionaryTest(DictionaryTestCase):
+    temporary_directory = True
+
+    def setUp(self):
+        super().setUp()
+        self.source_path = self.temp_path("dict.asd")
+        shutil.copyfile(TEST_DICT, self.source_path)
+
+    def compiled_paths(self):
+        return glob.glob(os.path.join(self.directory, "*.asdb"))
+
+    def test_mapping(self):
+        dictionary = CompiledDictionary(self.layout, self.source_path)
+        items = list(dictionary.items())
+
+        self.assertGreater(len(items), 0)
+        self.assertEqual(len(dictionary), len(items))
+        self.assertEqual(list(dictionary.keys()), [key for key, translation in items])
+        self.assertEqual(list(dictionary), [key for key, translation in items])
+        self.assertEqual(list(dictionary.values()),
+            [translation for key, translation in items])
+        self.assertEqual(dictionary.longest_key, max(len(key) for key, translation in items))
+
+        for key, translation in items:
+            self.assertEqual(dictionary[key], translation)
+            self.assertIn(key, dictionary)
+            self.assertIn(key, dictionary.reverse_lookup(translation))
+            self.assertIn(translation,
+                dictionary.casereverse_lookup(translation.upper()))
+
+        self.assertIsNone(dictionary.get(("STKPWHRAO*EUFRPBLGTS",)))
+        self.assertEqual(dictionary.get(("not a stroke",), "fallback"), "fallback")
+        with self.assertRaises(KeyError):
+            dictionary[("STKPWHRAO*EUFRPBLGTS",)]
+        self.assertEqual(dictionary.reverse_lookup("not a translation"), set())
+        dictionary.close()
+
+    def test_normalized_strokes(self):
+        dictionary = CompiledDictionary(self.layout, self.source_path)
+
+        # Left key only strokes don't end with a hyphen, as in Plover
+        self.assertIn(("HR",), dictionary.reverse_lookup("will"))
+        self.assertIn((("HR",), "will"), list(dictionary.items()))
+        self.assertEqual(dictionary[("HR",)], "will")
+        self.assertEqual(dictionary[("HR-",)], "will")
+        for key in dictionary.keys():
+            for stroke_str in key:
+                self.assertFalse(stroke_str.endswith("-"), key)
+        dictionary.close()
+
+    def test_compiled_once(self):
+        CompiledDictionary(self.layout, self.source_path).close()
+        compiled_paths = self.compiled_paths()
+        self.assertEqual(len(compiled_paths), 1)
+        mtime = os.stat(compiled_paths[0]).st_mtime_ns
+
+        CompiledDictionary(self.layout, self.source_path).close()
+        self.assertEqual(self.compiled_paths(), compiled_paths)
+        self.assertEqual(os.stat(compiled_paths[0]).st_mtime_ns, mtime)
+
+    def test_recompiled_on_change(self):
+        CompiledDictionary(self.layout, self.source_path).close()
+        old_paths = self.compiled_paths()
+
+        with open(self.source_path, encoding = "utf-8") as source_file:
+            source = source_file.read()
+        with open(self.source_path, "w", encoding = "utf-8") as source_file:
+            source_file.write(source.replace("{", '{\n"wug": "WUG",', 1))
+
+        dictionary = CompiledDictionary(self.layout, self.source_path)
+        self.assertEqual(dictionary[("WUG",)], "wug")
+        compiled_paths = self.compiled_paths()
+        self.assertEqual(len(compiled_paths), 1)
+        self.assertNotEqual(compiled_paths, old_paths)
+        dictionary.close()
+
+    @unittest.skipIf(plover is None, "Plover isn't installed")
+    def test_plover_dictionary(self):
+        from plover_dictionary import AdvancedPloverDictionary
+
+        dictionary = AdvancedPloverDictionary.load(self.source_path)
+        compiled = CompiledDictionary(self.layout, self.source_path)
+
+        self.assertEqual(len(dictionary), len(compiled))
+        self.assertEqual(list(dictionary.keys()), list(compiled.keys()))
+        self.assertEqual(list(dictionary.values()), list(compiled.values()))
+        self.assertEqual(list(dictionary.items()), list(compiled.items()))
+        self.assertEqual(dictionary.longest_key, compiled.longest_key)
+        for key, translation in compiled.items():
+            self.assertEqual(dictionary[key], translation)
+
+        previous = dictionary.compiled
+        dictionary._load(self.source_path)
+        self.assertTrue(previous.binary is None)
+        compiled.close()
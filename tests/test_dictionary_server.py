@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import socket
+import threading
+
+from tests import DictionaryTestCase
+from dictionary_server import DictionaryServer, create_server, close_server
+
+
+SOURCE = {
+    "N|ml": "TPH",
+    "nat": "NAT",
+    "gnat": "NAT/TKPW",
+    "nats": "Nat-S"}
+
+
+class DictionaryServerTest(DictionaryTestCase):
+    temporary_directory = True
+
+    def setUp(self):
+        super().setUp()
+        self.source_path = self.temp_path("source.json")
+        self.write_source(SOURCE)
+
+        self.dictionary_server = DictionaryServer(
+            self.layout, self.source_path, poll_interval = 0.01)
+        self.server = create_server(self.dictionary_server,
+            self.temp_path("socket"))
+        self.threads = [
+            threading.Thread(target = self.dictionary_server.watch),
+            threading.Thread(target = self.server.serve_forever)]
+        for thread in self.threads:
+            thread.start()
+
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(self.server.socket_path)
+        self.responses = self.connection.makefile("rb")
+
+    def tearDown(self):
+        self.responses.close()
+        self.connection.close()
+        self.server.shutdown()
+        close_server(self.server)
+        for thread in self.threads:
+            thread.join()
+        self.assertFalse(os.path.exists(self.temp_path("socket")))
+
+    # Writes the source with a new modification time, so it's always seen as
+    # changed.
+    def write_source(self, source):
+        text = source if isinstance(source, str) else json.dumps(source)
+        with open(self.source_path, "w") as source_file:
+            source_file.write(text)
+        mtime = getattr(self, "mtime", time.time_ns()) + 10 ** 9
+        os.utime(self.source_path, ns = (mtime, mtime))
+        self.mtime = mtime
+
+    def request(self, request):
+        line = request if isinstance(request, str) else json.dumps(request)
+        self.connection.sendall((line + "\n").encode("utf-8"))
+        return json.loads(self.responses.readline().decode("utf-8"))
+
+    # Waits for the watcher to have handled the last source change.
+    def wait_for_rebuild(self):
+        for i in range(0, 500):
+            if self.dictionary_server.source_mtime == self.mtime:
+                return
+            time.sleep(0.01)
+        self.fail("Source wasn't rebuilt")
+
+    def test_lookup(self):
+        self.assertEqual(self.request({"lookup": "TPHAT"}), {"translation": "nat"})
+        self.assertEqual(self.request({"lookup": "TPHAT/TKPW"}), {"translation": "gnat"})
+        # Strokes are normalized
+        self.assertEqual(self.request({"lookup": "TPHA-T"}), {"translation": "nat"})
+        self.assertEqual(self.request({"lookup": "STPH"}), {"translation": None})
+
+    def test_reverse(self):
+        self.assertEqual(self.request({"reverse": "nat"}), {"strokes": ["TPHAT"]})
+        self.assertEqual(self.request({"reverse": "wug"}), {"strokes": []})
+
+    def test_mixins(self):
+        self.assertEqual(self.request({"mixins": "TPHATS"}), {
+            "entry": {"translation": "nats", "strokes": "Nat-S"},
+            "mixins": ["nat", "-", "-s"]})
+        self.assertEqual(self.request({"mixins": "STPH"}),
+            {"entry": None, "mixins": []})
+
+    def test_bad_requests(self):
+        self.assertIn("error", self.request({"what": "TPHAT"}))
+        self.assertIn("error", self.request("not json"))
+        # The connection is still usable
+        self.assertEqual(self.request({"lookup": "TPHAT"}), {"translation": "nat"})
+
+    def test_reload(self):
+        self.write_source(dict(SOURCE, nat = "NAPT"))
+        self.wait_for_rebuild()
+
+        self.assertEqual(self.request({"lookup": "TPHAPT"}), {"translation": "nat"})
+        self.assertEqual(self.request({"lookup": "TPHAT"}), {"translation": None})
+
+    def test_failed_reload(self):
+        # Unreadable source
+        self.write_source("{")
+        self.wait_for_rebuild()
+        self.assertEqual(self.request({"lookup": "TPHAT"}), {"translation": "nat"})
+
+        # Unexpected error while building
+        prune = self.dictionary_server.build_cache.prune
+        def failing_prune():
+            raise RuntimeError("prune failed")
+        self.dictionary_server.build_cache.prune = failing_prune
+        self.write_source(dict(SOURCE, wug = "WUG"))
+        self.wait_for_rebuild()
+        self.assertEqual(self.request({"lookup": "WUG"}), {"translation": None})
+        self.assertEqual(self.request({"lookup": "TPHAT"}), {"translation": "nat"})
+        self.dictionary_server.build_cache.prune = prune
+
+        # Values which aren't stroke sequences are skipped, reloading goes on
+        self.write_source(dict(SOURCE, wug = "WUG", bad = None))
+        self.wait_for_rebuild()
+        self.assertEqual(self.request({"lookup": "WUG"}), {"translation": "wug"})
+        self.assertEqual(self.request({"reverse": "bad"}), {"strokes": []})
@@ -0,0 +1,155 @@
+import unittest
+
+from tests import DictionaryTestCase
+from build_cache import BuildCache
+from advanced_translation import AdvancedTranslation
+from advanced_stroke_sequence import ExpansionError
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from benchmark import synthetic_source
+from util import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_max_size(self):
+        cache = LRUCache(2)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache.get("a")
+        cache["c"] = 3
+
+        self.assertEqual(list(cache.items), ["a", "c"])
+
+    def test_weight(self):
+        cache = LRUCache(10, len)
+        cache["a"] = "aaaa"
+        cache["b"] = "bbbb"
+        cache["c"] = "cccc"
+        self.assertEqual(list(cache.items), ["b", "c"])
+        self.assertEqual(cache.size, 8)
+
+        cache["b"] = "bb"
+        self.assertEqual(cache.size, 6)
+
+        # Too heavy to cache at all
+        cache["d"] = "d" * 11
+        self.assertNotIn("d", cache)
+        self.assertEqual(cache.size, 6)
+
+        cache.clear()
+        self.assertEqual(cache.size, 0)
+
+class ExpansionCacheTest(DictionaryTestCase):
+    temporary_directory = True
+
+    def build(self, source, expansion_cache = True):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        if not expansion_cache:
+            dictionary.expansion_cache = None
+        dictionary.add_entries(source)
+
+        return dictionary
+
+    def test_same_output(self):
+        source = synthetic_source(1000, shared_prefix_rate = 0.5)
+        cached = self.build(source)
+        uncached = self.build(source, False)
+
+        self.assertGreater(len(cached.expansion_cache), 0)
+        # Same entries in the same order
+        self.assertEqual(list(cached.entries.items()), list(uncached.entries.items()))
+
+    def test_mixin_variants_added(self):
+        source = [
+            ("N|ml", ["TPH", "STPH", "TKPWH", "SKWR"]),
+            ("Aa|mR", ["A", "AE", "AEU", "AU"]),
+            ("nat", "NAaT"),
+            # Adds variants to both prefix mixins after they're cached
+            ("N|ml", "TPR"),
+            ("Aa|mR", "AO"),
+            ("nad", "NAaD")]
+        cached = self.build(source)
+
+        self.assertNotIn("TPRAOT", cached.entries)
+        self.assertIn("TPRAOD", cached.entries)
+        self.assertEqual(cached.entries, self.build(source, False).entries)
+
+    def test_max_expansion(self):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.add_entries([
+            ("N|ml", ["TPH", "STPH", "TKPWH", "SKWR"]),
+            ("Aa|mR", ["A", "AE", "AEU", "AU"])])
+
+        ss = dictionary.parse_stroke_sequence("NAaT", AdvancedTranslation("nat"))
+        # 4 + 16 + 16 partial sequences
+        dictionary.max_expansion = 36
+        self.assertEqual(len(ss.to_simple_stroke_sequence_keys()), 16)
+
+        dictionary.max_expansion = 35
+        with self.assertRaises(ExpansionError):
+            ss.to_simple_stroke_sequence_keys()
+
+        # Exceeded while making the second level
+        dictionary.expansion_cache.clear()
+        dictionary.max_expansion = 10
+        with self.assertRaises(ExpansionError):
+            ss.to_simple_stroke_sequence_keys()
+        self.assertEqual(len(dictionary.expansion_cache), 0)
+
+    def test_max_expansion_per_entry(self):
+        for expansion_cache in (False, True):
+            dictionary = self.build([
+                    ("N|ml", ["TPH", "STPH", "TKPWH", "SKWR"]),
+                    ("Aa|mR", ["A", "AE", "AEU", "AU"])],
+                expansion_cache)
+
+            # 4 + 16 + 16 partial sequences for each binding
+            dictionary.max_expansion = 36
+            ss = dictionary.parse_stroke_sequence(
+                "NAa[T,-D]", AdvancedTranslation("[nat,nad]"))
+            for indices in ([0], [1]):
+                self.assertEqual(len(ss.to_simple_stroke_sequence_keys(indices)), 16)
+
+            # Both bindings (or stroke sequences) count towards the same limit
+            self.assertFalse(dictionary.add_entry("[nat,nad]", ["NAa[T,-D]"]))
+            self.assertFalse(dictionary.add_entry("nat", ["NAaT", "NAa-D"]))
+            # Only the first binding's (and stroke sequence's) entries
+            self.assertEqual(len(dictionary.entries), 16)
+            self.assertEqual(set(dictionary.entries.values()), {"nat"})
+
+            dictionary.max_expansion = 72
+            self.assertTrue(dictionary.add_entry("[nat,nad]", ["NAa[T,-D]"]))
+
+    def test_max_expansion_with_build_cache(self):
+        source = [
+            ("N|ml", ["TPH", "STPH", "TKPWH", "SKWR"]),
+            ("Aa|mR", ["A", "AE", "AEU", "AU"]),
+            ("nat", "NAaT"),
+            ("at", "AT")]
+        path = self.temp_path("cache.json")
+
+        def build(max_expansion):
+            build_cache = BuildCache(self.layout)
+            build_cache.load(path)
+            dictionary = AdvancedStenoDictionary(self.layout)
+            dictionary.max_expansion = max_expansion
+            dictionary.add_entries(source, build_cache)
+            build_cache.save(path)
+
+            return dictionary, build_cache
+
+        cold, build_cache = build(None)
+        self.assertEqual(len(cold.entries), 17)
+
+        # Cached by the unlimited build, "nat" is still over the limit
+        cold = AdvancedStenoDictionary(self.layout)
+        cold.max_expansion = 20
+        cold.add_entries(source)
+        warm, build_cache = build(20)
+        self.assertEqual(warm.entries, cold.entries)
+        self.assertEqual(warm.entries, {"AT": "at"})
+        self.assertEqual((build_cache.hits, build_cache.misses), (3, 1))
+
+        # The record is kept and is valid again under a looser limit
+        warm, build_cache = build(36)
+        self.assertEqual(len(warm.entries), 17)
+        self.assertEqual((build_cache.hits, build_cache.misses), (4, 0))
@@ -0,0 +1,127 @@
+import json
+import unittest
+
+from tests import DictionaryTestCase
+from stroke import KeyLayout, DEFAULT_LAYOUT, Stroke
+from advanced_translation import AdvancedTranslation
+from advanced_steno_dictionary import AdvancedStenoDictionary
+
+
+# C is both a left and a right key
+LAYOUT = "ABC|#*|CDE"
+
+
+class KeyLayoutTest(DictionaryTestCase):
+    layout_string = LAYOUT
+    temporary_directory = True
+
+    def write_layout(self, text):
+        path = self.temp_path("layout.json")
+        with open(path, "w") as layout_file:
+            layout_file.write(text)
+
+        return path
+
+    def test_from_string(self):
+        self.assertEqual(self.layout.keys, "ABC#*CDE")
+        self.assertEqual(self.layout.break_keys, (3, 5))
+        self.assertEqual(self.layout.key_positions, (
+            {"#": [3], "*": [4]},
+            {"A": [0], "B": [1], "C": [2]},
+            {"C": [5], "D": [6], "E": [7]}))
+
+        self.assertEqual(KeyLayout.from_string(DEFAULT_LAYOUT).keys,
+            "STKPWHRAO*EUFRPBLGTSDZ")
+
+    def test_from_sides_and_load(self):
+        for other in (
+                KeyLayout.from_sides("ABC", "#*", "CDE"),
+                KeyLayout.load(self.write_layout(json.dumps(
+                    {"left": "ABC", "middle": "#*", "right": "CDE"})))):
+            self.assertEqual(other.keys, self.layout.keys)
+            self.assertEqual(other.break_keys, self.layout.break_keys)
+
+    def test_bad_layouts(self):
+        for layout_string in ("ABC|#*", "ABC|#*|CDE|F", "A-C|#|D", "A/C|#|D"):
+            with self.assertRaises(ValueError):
+                KeyLayout.from_string(layout_string)
+
+        for text in (
+                "{\"left\": \"ABC\"",
+                json.dumps({"left": "ABC", "middle": "#*"}),
+                json.dumps({"left": "ABC", "middle": 1, "right": "CDE"}),
+                json.dumps(["ABC", "#*", "CDE"])):
+            with self.assertRaises(ValueError):
+                KeyLayout.load(self.write_layout(text))
+
+class LayoutStrokeTest(unittest.TestCase):
+    def setUp(self):
+        self.layout = KeyLayout.from_string(LAYOUT)
+
+    def keys(self, stroke_string):
+        return Stroke(self.layout, stroke_string).keys
+
+    def test_round_trip(self):
+        for stroke_string, keys in (
+                ("A-", 0b1),
+                ("AC-", 0b101),
+                ("-C", 0b100000),
+                ("C-C", 0b100100),
+                ("A#C", 0b101001),
+                ("ABC#*CDE", 0b11111111),
+                ("-", 0)):
+            self.assertEqual(self.keys(stroke_string), keys)
+            self.assertEqual(Stroke.from_keys(self.layout, keys).to_string(),
+                stroke_string)
+
+        # Strokes are normalized
+        self.assertEqual(Stroke(self.layout, "AC").to_string(), "AC-")
+        self.assertEqual(Stroke(self.layout, "CC").to_string(), "C-C")
+        self.assertEqual(Stroke(self.layout, "E").to_string(), "-E")
+
+    def test_middle_keys_divide(self):
+        # Keys after a middle key are right keys
+        self.assertEqual(self.keys("#C"), self.keys("#-C"))
+        self.assertEqual(self.keys("C*C"), 0b110100)
+
+        default = KeyLayout.from_string(DEFAULT_LAYOUT)
+        self.assertEqual(Stroke(default, "S*S").to_string(), "S*S")
+        self.assertEqual(Stroke(default, "TA").keys,
+            Stroke(default, "TA-").keys)
+        self.assertNotEqual(Stroke(default, "AT").keys,
+            Stroke(default, "TA").keys)
+
+    def test_bad_strokes(self):
+        # Unknown keys, keys out of order and keys on the wrong side parse
+        # as an empty stroke
+        for stroke_string in ("Q", "DA", "-A", "A-#", "C-CC"):
+            self.assertEqual(self.keys(stroke_string), 0)
+
+class LayoutDictionaryTest(DictionaryTestCase):
+    layout_string = LAYOUT
+
+    def setUp(self):
+        super().setUp()
+        self.dictionary = AdvancedStenoDictionary(self.layout)
+
+    def test_build(self):
+        self.dictionary.add_entries([
+            ("Ab|ml", "AB"),
+            ("Dz|mr", ["-D", "-DE"]),
+            ("abdz", "Ab#Dz"),
+            ("abc", "Ab-C"),
+            ("cc", "C*C")])
+
+        self.assertEqual(self.dictionary.entries, {
+            "AB#D": "abdz",
+            "AB#DE": "abdz",
+            "AB-C": "abc",
+            "C*C": "cc"})
+
+    def test_bad_keys(self):
+        for ss_str in ("Q", "-A", "E"):
+            with self.assertRaises(LookupError):
+                self.dictionary.parse_stroke_sequence(ss_str, AdvancedTranslation("x"))
+
+        self.assertFalse(self.dictionary.add_entry("x", ["-A"]))
+        self.assertEqual(self.dictionary.entries, {})
@@ -0,0 +1,50 @@
+from tests import DictionaryTestCase
+from stroke import StrokeSequence
+from advanced_steno_dictionary import Mixin
+
+
+class MixinTest(DictionaryTestCase):
+    def stroke_sequence(self, *keys):
+        return StrokeSequence.from_keys(self.layout, keys)
+
+    def test_snapshots(self):
+        mixin = Mixin()
+        mixin.add([self.stroke_sequence(1), self.stroke_sequence(2)])
+
+        keys = mixin.stroke_sequence_keys()
+        stroke_sequences = mixin.simple_stroke_sequences()
+        self.assertEqual(keys, ((1,), (2,)))
+        self.assertIs(mixin.stroke_sequence_keys(), keys)
+
+        mixin.add([self.stroke_sequence(2), self.stroke_sequence(4, 8)])
+
+        # Earlier snapshots don't change
+        self.assertEqual(keys, ((1,), (2,)))
+        self.assertEqual(len(stroke_sequences), 2)
+        self.assertEqual(mixin.stroke_sequence_keys(), ((1,), (2,), (4, 8)))
+        self.assertEqual(mixin.simple_stroke_sequences(), (
+            self.stroke_sequence(1), self.stroke_sequence(2), self.stroke_sequence(4, 8)))
+
+    def test_version(self):
+        mixin = Mixin()
+        initial_version = mixin.version
+        mixin.add([self.stroke_sequence(1)])
+        mixin.add([self.stroke_sequence(2)])
+
+        # Only hashed when read
+        self.assertEqual(mixin.version_count, 0)
+        version = mixin.version
+        self.assertEqual(mixin.version_count, 2)
+        self.assertNotEqual(version, initial_version)
+
+        # Only depends on the variants, not how they were added
+        other = Mixin()
+        other.add([self.stroke_sequence(1), self.stroke_sequence(2)])
+        self.assertEqual(other.version, version)
+
+        mixin.add([self.stroke_sequence(2)])
+        self.assertEqual(mixin.version, version)
+        mixin.add([self.stroke_sequence(4)])
+        self.assertNotEqual(mixin.version, version)
+
+        self.assertNotEqual(Mixin(1).version, Mixin(2).version)
@@ -0,0 +1,86 @@
+import json
+
+from tests import DictionaryTestCase, load_test_dict
+from advanced_translation import AdvancedTranslation
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from mixin_library import MixinLibrary
+
+
+class MixinLibraryTest(DictionaryTestCase):
+    temporary_directory = True
+
+    def setUp(self):
+        super().setUp()
+        self.entries = load_test_dict()
+        self.path = self.temp_path("library.json")
+
+    def build(self, entries, library = None):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        if library is not None:
+            library.apply(dictionary)
+        dictionary.add_entries(entries)
+
+        return dictionary
+
+    def save(self):
+        dictionary = self.build(self.entries)
+        MixinLibrary.from_dictionary(dictionary).save(self.path)
+
+        return dictionary
+
+    def edit(self, edit):
+        with open(self.path, encoding = "utf-8") as library_file:
+            data = json.load(library_file)
+        edit(data)
+        with open(self.path, "w", encoding = "utf-8") as library_file:
+            json.dump(data, library_file)
+
+    def test_round_trip(self):
+        dictionary = self.save()
+        library = MixinLibrary.load(self.path, self.layout)
+
+        # Same output as the default build, whether the source's mixin only
+        # entries are added again or left out
+        rebuilt = self.build(self.entries, library)
+        self.assertEqual(list(rebuilt.entries.items()), list(dictionary.entries.items()))
+
+        words = [(translation_str, ss_strs) for translation_str, ss_strs in self.entries
+            if AdvancedTranslation(translation_str).is_entry]
+        rebuilt = self.build(words, library)
+        self.assertEqual(list(rebuilt.entries.items()), list(dictionary.entries.items()))
+
+    def test_changed_variants(self):
+        self.save()
+
+        def edit(data):
+            mixin = next(mixin for mixin in data["mixins"] if len(mixin["variants"]) > 0)
+            mixin["variants"][0][0] ^= 1
+        self.edit(edit)
+
+        with self.assertRaisesRegex(ValueError, "corrupt"):
+            MixinLibrary.load(self.path, self.layout)
+
+    def test_removed_variants(self):
+        self.save()
+
+        def edit(data):
+            mixin = next(mixin for mixin in data["mixins"] if len(mixin["variants"]) > 1)
+            del mixin["variants"][-1]
+        self.edit(edit)
+
+        with self.assertRaisesRegex(ValueError, "corrupt"):
+            MixinLibrary.load(self.path, self.layout)
+
+    def test_missing_field(self):
+        self.save()
+        self.edit(lambda data: data["mixins"][0].pop("change_side"))
+
+        with self.assertRaisesRegex(ValueError, "corrupt"):
+            MixinLibrary.load(self.path, self.layout)
+
+    def test_format_version(self):
+        self.save()
+        self.edit(lambda data: data.update(format_version = 1))
+
+        with self.assertRaisesRegex(ValueError, "save it again"):
+            MixinLibrary.load(self.path, self.layout)
@@ -0,0 +1,74 @@
+from tests import DictionaryTestCase
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from build_cache import BuildCache
+
+
+SOURCE = [
+    ("N|ml", "TPH"),
+    ("Od|mR", "O"),
+    ("nat", "NAT"),
+    ("net", "NET"),
+    # Extended after nat and net used it
+    ("N|ml", "STPH"),
+    ("gnat", "N-T"),
+    ("nod", "NOd-D")]
+
+
+class MixinStatisticsTest(DictionaryTestCase):
+    def build(self, build_cache = None):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.add_entries(SOURCE, build_cache)
+
+        return dictionary
+
+    # mixin key -> (variants, references) of the named mixins
+    def statistics(self, dictionary):
+        return {keys[0]: (len(mixin.variants), mixin.references)
+            for keys, mixin in dictionary.mixin_statistics()
+            if keys[0] in ("\"N\"", "\"Od\"", "-t")}
+
+    def test_statistics(self):
+        dictionary = self.build()
+
+        self.assertEqual(self.statistics(dictionary), {
+            "\"N\"": (2, 4),
+            "\"Od\"": (1, 1),
+            "-t": (1, 3)})
+        self.assertEqual(dictionary.entries, {
+            "TPHAT": "nat",
+            "TPHET": "net",
+            "TPH-T": "gnat",
+            "STPH-T": "gnat",
+            "TPHOD": "nod",
+            "STPHOD": "nod"})
+
+        # Each mixin is listed once with all its keys, costliest first
+        statistics = dictionary.mixin_statistics()
+        self.assertEqual(statistics[0][0], ["\"N\"", "n"])
+        self.assertEqual(len(statistics),
+            len({id(mixin) for mixin in dictionary.mixins.values()}))
+        costs = [len(mixin.variants) * mixin.references
+            for keys, mixin in statistics]
+        self.assertEqual(costs, sorted(costs, reverse = True))
+
+    def test_unreferenced(self):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.add_entries([("N|ml", ["TPH", "STPH"]), ("at", "AT")])
+
+        self.assertEqual(dictionary.mixins["n"].references, 0)
+        self.assertEqual(dictionary.mixin_statistics()[-1][1].references, 0)
+
+    def test_replayed_references(self):
+        expected = self.statistics(self.build())
+        build_cache = BuildCache(self.layout)
+        self.build(build_cache)
+
+        # Entries replayed from the cache are counted too
+        dictionary = self.build(build_cache)
+        self.assertEqual(build_cache.misses, len(SOURCE))
+        self.assertEqual(build_cache.hits, len(SOURCE))
+        self.assertEqual(self.statistics(dictionary), expected)
+
+        dictionary = AdvancedStenoDictionary(self.layout)
+        list(dictionary.generate_entries(SOURCE, build_cache))
+        self.assertEqual(self.statistics(dictionary), expected)
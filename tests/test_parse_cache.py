@@ -0,0 +1,59 @@
+from tests import DictionaryTestCase
+from advanced_translation import AdvancedTranslation
+from advanced_steno_dictionary import AdvancedStenoDictionary
+
+
+class ParseCacheTest(DictionaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dictionary = AdvancedStenoDictionary(self.layout)
+
+    def parse(self, ss_str, translation_str):
+        return self.dictionary.parse_stroke_sequence(
+            ss_str, AdvancedTranslation(translation_str))
+
+    def expand(self, ss):
+        return [simple_stroke_sequence.to_string()
+            for simple_stroke_sequence in ss.to_simple_stroke_sequences()]
+
+    def test_hit(self):
+        self.dictionary.add_entries([("Foo|m", "TPAO")])
+        ss = self.parse("Foo-S", "foos")
+
+        cached = self.parse("Foo-S", "fooz")
+        self.assertIs(cached, ss)
+        self.assertEqual(self.expand(cached), ["TPAOS"])
+
+        # Added variants are used by the cached stroke sequence
+        self.dictionary.add_entries([("Foo|m", "TPO")])
+        self.assertIs(self.parse("Foo-S", "foos"), ss)
+        self.assertEqual(self.expand(ss), ["TPAOS", "TPOS"])
+
+    def test_option_groups(self):
+        ss = self.parse("SA[T,]", "sa[t,]")
+        self.assertIs(self.parse("SA[T,]", "sa[t,]"), ss)
+        # Different translation options can fill in different stroke options
+        self.assertIsNot(self.parse("SA[T,]", "sa[d,]"), ss)
+
+    def test_mixin_redefined(self):
+        self.dictionary.add_entries([("Foo|m", "TPAO")])
+        ss = self.parse("Foo-S", "foos")
+
+        # Replaces the mixin the simplified key foo refers to
+        self.dictionary.add_entries([("foo|m", "PHAO")])
+        reparsed = self.parse("Foo-S", "foos")
+        self.assertIsNot(reparsed, ss)
+        self.assertEqual(self.expand(reparsed), ["PHAOS"])
+
+    def test_key_redefined(self):
+        ss = self.parse("SAT", "sat")
+        self.assertEqual(self.expand(ss), ["SAT"])
+
+        # Replaces the mixin of key S
+        self.dictionary.add_entries([("s|ml", "STK")])
+        reparsed = self.parse("SAT", "sat")
+        self.assertIsNot(reparsed, ss)
+        self.assertEqual(self.expand(reparsed), ["STKAT"])
+
+        self.dictionary.add_entries([("sat", "SAT")])
+        self.assertEqual(self.dictionary.entries, {"STKAT": "sat"})
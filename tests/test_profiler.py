@@ -0,0 +1,65 @@
+from tests import DictionaryTestCase
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from profiler import BuildProfiler
+
+
+class BuildProfilerTest(DictionaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dictionary = AdvancedStenoDictionary(self.layout)
+        self.dictionary.profiler = BuildProfiler()
+
+    def test_duplicate_translations(self):
+        self.dictionary.add_entries([
+            ("N|ml", ["TPH", "STPH"]),
+            ("nat", "NAT"),
+            ("nat", "NAPBT"),
+            ("nat", "NAT/NAT")])
+
+        entries = self.dictionary.profiler.entries
+        self.assertEqual(sorted(entries), [0, 1, 2, 3])
+        self.assertEqual([entries[i].translation_str for i in range(0, 4)],
+            ["N|ml", "nat", "nat", "nat"])
+        self.assertEqual([entries[i].sequences for i in range(1, 4)], [2, 2, 4])
+
+        report = self.dictionary.profiler.to_json(10)
+        self.assertEqual(sorted(entry["index"] for entry in report["entries"]),
+            [0, 1, 2, 3])
+
+    def test_phases(self):
+        self.dictionary.add_entries([
+            ("N|ml", ["TPH", "STPH"]),
+            ("nat[s,]", "NAT[-S,]")])
+
+        entry = self.dictionary.profiler.entries[1]
+        phases = [
+            entry.translation_parse_seconds,
+            entry.parse_seconds,
+            entry.permutation_seconds,
+            entry.expansion_seconds]
+        for seconds in phases:
+            self.assertGreater(seconds, 0)
+        self.assertLessEqual(sum(phases), entry.seconds)
+
+    def test_expansion_error(self):
+        self.dictionary.max_expansion = 1
+        self.dictionary.add_entries([
+            ("N|ml", ["TPH", "STPH"]),
+            ("nat", "NAT")])
+
+        profiler = self.dictionary.profiler
+        self.assertIsNone(profiler.entry)
+        self.assertEqual(sorted(profiler.entries), [0, 1])
+        self.assertGreater(profiler.entries[1].seconds, 0)
+
+    def test_exception(self):
+        def parse_stroke_sequence(ss_str, translation):
+            raise RuntimeError("parse failed")
+        self.dictionary.parse_stroke_sequence = parse_stroke_sequence
+
+        with self.assertRaises(RuntimeError):
+            self.dictionary.add_entries([("nat", "NAT")])
+
+        profiler = self.dictionary.profiler
+        self.assertIsNone(profiler.entry)
+        self.assertGreater(profiler.entries[0].seconds, 0)
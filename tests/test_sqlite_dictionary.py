@@ -0,0 +1,89 @@
+import json
+import sqlite3
+
+from tests import DictionaryTestCase, load_test_dict
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from sqlite_dictionary import write_sqlite_dictionary
+
+
+class SqliteDictionaryTest(DictionaryTestCase):
+    temporary_directory = True
+
+    def setUp(self):
+        super().setUp()
+        self.entries = load_test_dict()
+        self.path = self.temp_path("dict.sqlite")
+
+    def build(self, entries):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.entry_sources = {}
+        dictionary.add_entries(entries)
+
+        return dictionary
+
+    def query(self, sql, *parameters):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            connection.close()
+
+    def test_lookups(self):
+        dictionary = self.build(self.entries)
+        self.assertEqual(write_sqlite_dictionary(self.path, dictionary),
+            (len(dictionary.entries), 0))
+
+        self.assertEqual(dict(self.query("SELECT strokes, translation FROM entries")),
+            dictionary.entries)
+        for key_str, translation in dictionary.entries.items():
+            self.assertEqual(
+                self.query("SELECT translation FROM entries WHERE strokes = ?", key_str),
+                [(translation,)])
+            self.assertIn((key_str,),
+                self.query("SELECT strokes FROM entries WHERE translation = ?", translation))
+
+        # "willing": "Will-G" is built from the will mixin
+        key_str = next(key_str for key_str, translation in dictionary.entries.items()
+            if translation == "willing")
+        source_translation, source_strokes, mixins = self.query(
+            "SELECT source_translation, source_strokes, mixins FROM entry_sources "
+            "WHERE strokes = ?", key_str)[0]
+        self.assertEqual((source_translation, source_strokes), ("willing", "Will-G"))
+        self.assertIn("will", json.loads(mixins))
+
+    def test_incremental(self):
+        write_sqlite_dictionary(self.path, self.build(self.entries))
+
+        # Unchanged
+        self.assertEqual(write_sqlite_dictionary(self.path, self.build(self.entries)), (0, 0))
+
+        entries = [(translation_str, ss_strs) for translation_str, ss_strs in self.entries
+            if translation_str != "willing"]
+        dictionary = self.build(entries)
+        self.assertEqual(write_sqlite_dictionary(self.path, dictionary), (0, 2))
+        self.assertEqual(dict(self.query("SELECT strokes, translation FROM entries")),
+            dictionary.entries)
+        # Sources of removed entries are deleted with them
+        self.assertEqual(self.query("SELECT COUNT(*) FROM entry_sources"),
+            [(len(dictionary.entries),)])
+
+    def test_only_changed_mixins(self):
+        write_sqlite_dictionary(self.path, self.build(self.entries))
+
+        calls = []
+        dictionary = self.build([(translation_str, "Will-D" if translation_str == "willing" else ss_strs)
+            for translation_str, ss_strs in self.entries])
+        stroke_sequence_mixin_keys = dictionary.stroke_sequence_mixin_keys
+        def counting_mixin_keys(translation_str, ss_str):
+            calls.append((translation_str, ss_str))
+            return stroke_sequence_mixin_keys(translation_str, ss_str)
+        dictionary.stroke_sequence_mixin_keys = counting_mixin_keys
+
+        written, deleted = write_sqlite_dictionary(self.path, dictionary)
+        self.assertEqual(calls, [("willing", "Will-D")])
+        self.assertEqual((written, deleted), (2, 2))
+        self.assertEqual(dict(self.query("SELECT strokes, translation FROM entries")),
+            dictionary.entries)
+        self.assertEqual(self.query("SELECT source_strokes, mixins FROM entry_sources "
+                "WHERE source_translation = 'willing'"),
+            [("Will-D", '["will", "-", "-d"]')] * 2)
@@ -0,0 +1,112 @@
+from tests import DictionaryTestCase
+from stroke import KeyLayout, DEFAULT_LAYOUT, Stroke, StrokeSequence, \
+    stroke_sequence_keys
+
+
+class StrokeTest(DictionaryTestCase):
+    def stroke(self, stroke_string):
+        return Stroke(self.layout, stroke_string)
+
+    def test_keys(self):
+        # Bit i is key i of STKPWHRAO*EUFRPBLGTSDZ
+        self.assertEqual(self.stroke("S").keys, 1)
+        self.assertEqual(self.stroke("-Z").keys, 1 << 21)
+        self.assertEqual(self.stroke("TPH-S").keys,
+            (1 << 1) | (1 << 3) | (1 << 5) | (1 << 19))
+        self.assertEqual(self.stroke("").keys, 0)
+        self.assertEqual(Stroke.from_keys(self.layout, 1 << 9).to_string(), "*")
+
+    def test_add_remove(self):
+        stroke = self.stroke("TPH")
+        added = stroke.add(self.stroke("AT"))
+        self.assertEqual(added.to_string(), "TPHAT")
+        # Strokes don't change
+        self.assertEqual(stroke.to_string(), "TPH-")
+
+        self.assertEqual(added.remove(self.stroke("TPH")).to_string(), "AT")
+        self.assertEqual(added.remove(self.stroke("-S")), added)
+
+    def test_equality(self):
+        self.assertEqual(self.stroke("TPHAT"), self.stroke("TPHA-T"))
+        self.assertEqual(hash(self.stroke("TPHAT")), hash(self.stroke("TPHA-T")))
+        self.assertNotEqual(self.stroke("TPHAT"), self.stroke("TPHAS"))
+        # Strokes of different layouts are never equal
+        self.assertNotEqual(self.stroke("S"),
+            Stroke(KeyLayout.from_string(DEFAULT_LAYOUT), "S"))
+
+class StrokeCacheTest(DictionaryTestCase):
+    def test_render_cache(self):
+        stroke = Stroke.from_keys(self.layout, Stroke(self.layout, "TPHAT").keys)
+        self.assertNotIn(stroke.keys, self.layout.render_cache)
+        self.assertEqual(stroke.to_string(), "TPHAT")
+        self.assertEqual(self.layout.render_cache.get(stroke.keys), "TPHAT")
+
+        # Stroke sequences render from the same cache
+        self.layout.render_cache[stroke.keys] = "cached"
+        self.assertEqual(StrokeSequence([stroke, stroke]).to_string(), "cached/cached")
+
+        # Each layout has its own cache
+        other = KeyLayout.from_string(DEFAULT_LAYOUT)
+        self.assertEqual(Stroke.from_keys(other, stroke.keys).to_string(), "TPHAT")
+
+    def test_parse_cache(self):
+        keys = Stroke(self.layout, "TPHA-T").keys
+        self.assertEqual(self.layout.parse_cache.get("TPHA-T"), keys)
+        self.assertEqual(Stroke(self.layout, "TPHA-T").keys, keys)
+
+        self.layout.parse_cache["TPHA-T"] = 1
+        self.assertEqual(Stroke(self.layout, "TPHA-T").keys, 1)
+
+    def test_cached_matches_uncached(self):
+        for keys in range(0, 1 << 12):
+            keys = (keys & 0x3f) | ((keys >> 6) << 14)
+            stroke = Stroke.from_keys(self.layout, keys)
+            self.assertEqual(stroke.to_string(), stroke._to_string())
+            self.assertEqual(stroke.to_string(), stroke._to_string())
+            self.assertEqual(Stroke._parse(self.layout, stroke.to_string()), keys)
+
+    def test_cache_size(self):
+        original_size = KeyLayout.cache_size
+        KeyLayout.cache_size = 4
+        try:
+            layout = KeyLayout.from_string(DEFAULT_LAYOUT)
+        finally:
+            KeyLayout.cache_size = original_size
+
+        for keys in range(0, 10):
+            Stroke.from_keys(layout, keys).to_string()
+        self.assertEqual(len(layout.render_cache), 4)
+
+class StrokeSequenceTest(DictionaryTestCase):
+    def stroke_sequence(self, stroke_sequence_string):
+        return StrokeSequence.from_keys(self.layout,
+            stroke_sequence_keys(self.layout, stroke_sequence_string))
+
+    def test_combine(self):
+        stroke_sequence = self.stroke_sequence("TPH/KA")
+        added = stroke_sequence.add(self.stroke_sequence("-T/WUG"))
+        self.assertEqual(added.to_string(), "TPH-/KAT/WUG")
+        self.assertEqual(len(added), 3)
+        # Stroke sequences don't change
+        self.assertEqual(stroke_sequence.to_string(), "TPH-/KA")
+
+        self.assertEqual(added.remove(self.stroke_sequence("-G")).to_string(),
+            "TPH-/KAT/WU")
+        # The first stroke is removed from the last stroke, the rest are appended
+        self.assertEqual(added.remove(self.stroke_sequence("WU/S")).to_string(),
+            "TPH-/KAT/-G/S-")
+        self.assertEqual(
+            stroke_sequence.combine(self.stroke_sequence("A"), 1).to_string(),
+            "TPH-/K-")
+        self.assertEqual(
+            stroke_sequence.combine(self.stroke_sequence("-S"), 0),
+            self.stroke_sequence("TPH/KAS"))
+
+    def test_strokes(self):
+        stroke_sequence = StrokeSequence(
+            [Stroke(self.layout, "TPH"), Stroke(self.layout, "KAT")])
+        self.assertEqual(stroke_sequence.keys,
+            stroke_sequence_keys(self.layout, "TPH/KAT"))
+        self.assertEqual(stroke_sequence.strokes,
+            (Stroke(self.layout, "TPH"), Stroke(self.layout, "KAT")))
+        self.assertEqual(hash(stroke_sequence), hash(self.stroke_sequence("TPH/KAT")))
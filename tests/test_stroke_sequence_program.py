@@ -0,0 +1,103 @@
+from tests import DictionaryTestCase, load_test_dict
+from stroke import stroke_sequence_keys
+from advanced_translation import AdvancedTranslation
+from advanced_stroke_sequence import AdvancedStrokeSequencePart, ParseError
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from permutate import iter_tree_indices
+from benchmark import synthetic_source
+
+
+# Expands a stroke sequence's parts in order without compiling them, making
+# every combination and dropping duplicates afterwards.
+def reference_keys(ss, selection_tree):
+    sequences = [(0,)]
+    for part in ss.parts:
+        if isinstance(part, AdvancedStrokeSequencePart):
+            variants = part.mixin.stroke_sequence_keys()
+        else:
+            choice = selection_tree[part.bound_index] if len(selection_tree) > 0 else 0
+            if isinstance(choice, int):
+                variants = part.options[choice].to_simple_stroke_sequence_keys(())
+            else:
+                variants = part.options[choice[0]].to_simple_stroke_sequence_keys(choice[1])
+
+        combined = []
+        for keys in sequences:
+            for keys_b in variants:
+                if part.action == 0:
+                    combined.append(keys[:-1] + (keys[-1] | keys_b[0],) + keys_b[1:])
+                else:
+                    combined.append(keys[:-1] + (keys[-1] & ~keys_b[0],) + keys_b[1:])
+        sequences = list(dict.fromkeys(combined))
+
+    return sequences
+
+class StrokeSequenceProgramTest(DictionaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dictionary = AdvancedStenoDictionary(self.layout)
+        self.dictionary.add_entries([
+            ("N|ml", ["TPH", "STPH", "TKPWH", "SKWR"]),
+            ("Aa|mR", ["A", "AE", "AEU", "AU"])])
+
+    def keys(self, *ss_strs):
+        return [stroke_sequence_keys(self.layout, ss_str) for ss_str in ss_strs]
+
+    def test_compile(self):
+        ss = self.dictionary.parse_stroke_sequence(
+            "NAa[T,-D]", AdvancedTranslation("[nat,nad]"))
+        program = ss.program()
+
+        self.assertIs(ss.program(), program)
+        self.assertEqual(len(program), 3)
+        self.assertEqual([slot for operand_id, action, slot in program.instructions],
+            [-1, -1, 0])
+        self.assertEqual(program.mixin_keys, ["n", "aa", None])
+        self.assertEqual(program.mixin_prefix, 2)
+        self.assertIs(program.operands[0], self.dictionary.mixins["n"])
+
+        # Removal is an instruction action
+        program = self.dictionary.parse_stroke_sequence(
+            "NAa^A", AdvancedTranslation("nay")).program()
+        self.assertEqual([action for operand_id, action, slot in program.instructions],
+            [0, 0, 1])
+
+    def test_run(self):
+        ss = self.dictionary.parse_stroke_sequence(
+            "NAa[T,-D]", AdvancedTranslation("[nat,nad]"))
+        program = ss.program()
+
+        for indices, option_keys in (((0,), self.keys("-T")), ((1,), self.keys("-D"))):
+            parts = program.run(indices)
+            self.assertEqual(parts, [
+                (0, self.dictionary.mixins["n"].stroke_sequence_keys()),
+                (0, self.dictionary.mixins["aa"].stroke_sequence_keys()),
+                (0, option_keys)])
+            self.assertEqual(program.count(indices), 16)
+
+        self.assertEqual(ss.to_simple_stroke_sequence_keys((1,))[:2],
+            self.keys("TPHAD", "TPHAED"))
+
+    def test_matches_reference(self):
+        entries = list(load_test_dict())
+        entries += synthetic_source(300, removal_rate = 0.3, shared_prefix_rate = 0.3)
+
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.add_entries(entries)
+
+        checked = 0
+        for translation_str, ss_strs in entries:
+            translation = AdvancedTranslation(translation_str)
+            for ss_str in [ss_strs] if isinstance(ss_strs, str) else ss_strs:
+                try:
+                    ss = dictionary.parse_stroke_sequence(ss_str, translation)
+                except (ParseError, LookupError):
+                    continue
+                for indices in iter_tree_indices(translation):
+                    self.assertEqual(
+                        ss.to_simple_stroke_sequence_keys(indices),
+                        reference_keys(ss, indices),
+                        translation_str + ": " + ss_str)
+                    checked += 1
+
+        self.assertGreater(checked, 300)
@@ -0,0 +1,80 @@
+from tests import DictionaryTestCase, load_test_dict
+from stroke import stroke_sequence_keys
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from build_cache import BuildCache
+from stroke_trie import StrokeTrie
+
+
+class StrokeTrieTest(DictionaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.entries = load_test_dict()
+
+    def keys(self, key_str):
+        return stroke_sequence_keys(self.layout, key_str)
+
+    def assertIndexes(self, trie, entries):
+        self.assertEqual(len(trie), len(entries))
+        for key_str, translation in entries.items():
+            self.assertEqual(trie.lookup(self.keys(key_str)), translation)
+        self.assertEqual(trie.longest_key,
+            max(len(key_str.split("/")) for key_str in entries))
+
+    def test_built_by_add_entries(self):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.stroke_trie = StrokeTrie()
+        dictionary.add_entries(self.entries)
+
+        self.assertIndexes(dictionary.stroke_trie, dictionary.entries)
+
+    def test_built_from_build_cache(self):
+        build_cache = BuildCache(self.layout)
+        AdvancedStenoDictionary(self.layout).add_entries(self.entries, build_cache)
+
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.stroke_trie = StrokeTrie()
+        dictionary.add_entries(self.entries, build_cache)
+
+        self.assertEqual(build_cache.hits, len(self.entries))
+        self.assertIndexes(dictionary.stroke_trie, dictionary.entries)
+
+    def test_built_by_generate_entries(self):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.stroke_trie = StrokeTrie()
+        entries = {}
+        for translation_str, ss_str, key_str, simple_translation \
+                in dictionary.generate_entries(self.entries):
+            entries[key_str] = simple_translation
+
+        self.assertIndexes(dictionary.stroke_trie, entries)
+
+    def test_not_built_by_default(self):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.add_entries(self.entries)
+
+        self.assertIsNone(dictionary.stroke_trie)
+
+    def test_lookups(self):
+        trie = StrokeTrie()
+        trie.add(self.keys("TRAPBLG"), "tragic")
+        trie.add(self.keys("TRAPBLG/EUBG"), "tragic")
+        trie.add(self.keys("TRAPBLG/EUBG/HREU"), "tragically")
+        trie.add(self.keys("TKPWRAET"), "great")
+
+        self.assertEqual(len(trie), 4)
+        self.assertEqual(trie.longest_key, 3)
+        self.assertIn(self.keys("TRAPBLG/EUBG"), trie)
+        self.assertNotIn(self.keys("EUBG"), trie)
+        self.assertEqual(trie.lookup(self.keys("EUBG"), "none"), "none")
+        self.assertEqual(trie.stroke_counts(), [0, 2, 1, 1])
+
+        self.assertEqual([translation for keys, translation
+                in trie.iter_prefix(self.keys("TRAPBLG"))],
+            ["tragic", "tragic", "tragically"])
+
+        strokes = self.keys("TRAPBLG/EUBG/HREU/TKPWRAET/EUBG/TRAPBLG/EUBG")
+        self.assertEqual(trie.longest_match(strokes), (3, "tragically"))
+        self.assertEqual(trie.longest_match(strokes, 4), (0, None))
+        self.assertEqual([translation for keys, translation
+                in trie.translate(strokes)],
+            ["tragically", "great", None, "tragic"])
@@ -0,0 +1,117 @@
+import unittest
+
+from tests import DictionaryTestCase
+from advanced_translation import AdvancedTranslation
+from advanced_stroke_sequence import ExpansionError
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from benchmark import synthetic_source
+import vectorized_expansion
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+SOURCE = [
+    ("N|ml", ["TPH", "STPH", "TKPWH", "SKWR"]),
+    ("Aa|mR", ["A", "AE", "AEU", "AU"]),
+    ("K|mr", ["-BG", "-G", "-PBG", "-BGS"]),
+    ("nak", "NAaK"),
+    ("nakt", "NAaK-T"),
+    ("nak removed", "NAaK^A"),
+    ("nak[s,ed,]", "NAaK&[-S,-D,]"),
+    ("nak multi", "NAaK/-T")]
+
+
+@unittest.skipIf(not vectorized_expansion.available(), "NumPy isn't installed")
+class VectorizedExpansionTest(DictionaryTestCase):
+    def dictionary(self, vectorized):
+        dictionary = AdvancedStenoDictionary(self.layout)
+        dictionary.expansion_cache = None
+        dictionary.vectorized_expansion = vectorized
+
+        return dictionary
+
+    def test_same_keys(self):
+        scalar = self.dictionary(False)
+        vectorized = self.dictionary(True)
+        scalar.add_entries(SOURCE[:3])
+        vectorized.add_entries(SOURCE[:3])
+
+        for translation_str, ss_str in SOURCE[3:]:
+            scalar_ss = scalar.parse_stroke_sequence(ss_str, AdvancedTranslation(translation_str))
+            vectorized_ss = vectorized.parse_stroke_sequence(ss_str, AdvancedTranslation(translation_str))
+
+            # Same stroke sequences in the same order
+            self.assertEqual(
+                vectorized_ss.to_simple_stroke_sequence_keys(),
+                scalar_ss.to_simple_stroke_sequence_keys())
+
+        # Only sequences with single stroke variants are vectorized
+        ss = vectorized.parse_stroke_sequence("NAaK", AdvancedTranslation("nak"))
+        self.assertIsNotNone(ss._single_stroke_arrays(ss.program(), []))
+        ss = vectorized.parse_stroke_sequence("NAaK/-T", AdvancedTranslation("nak multi"))
+        self.assertIsNone(ss._single_stroke_arrays(ss.program(), []))
+
+    def test_same_output(self):
+        for source in (SOURCE, synthetic_source(1000, shared_prefix_rate = 0.5)):
+            scalar = self.dictionary(False)
+            vectorized = self.dictionary(True)
+            scalar.add_entries(source)
+            vectorized.add_entries(source)
+
+            self.assertEqual(list(vectorized.entries.items()), list(scalar.entries.items()))
+
+    def test_max_expansion(self):
+        for vectorized in (False, True):
+            dictionary = self.dictionary(vectorized)
+            dictionary.add_entries(SOURCE[:3])
+            ss = dictionary.parse_stroke_sequence("NAaK", AdvancedTranslation("nak"))
+
+            # 4 + 16 + 64 partial sequences
+            dictionary.max_expansion = 84
+            self.assertEqual(len(ss.to_simple_stroke_sequence_keys()), 64)
+
+            dictionary.max_expansion = 83
+            with self.assertRaises(ExpansionError):
+                ss.to_simple_stroke_sequence_keys()
+
+    def expand(self, parts, max_expansion = None):
+        def check(expansion_count):
+            if max_expansion is not None and expansion_count > max_expansion:
+                raise ExpansionError("over budget")
+
+        return list(vectorized_expansion.iter_single_stroke_sequence_keys(
+            parts, [], check, max_expansion))
+
+    def test_budget_before_allocation(self):
+        sizes = []
+        combine = vectorized_expansion._combine
+        def recording_combine(action, level, variants):
+            combined = combine(action, level, variants)
+            sizes.append(combined.size)
+            return combined
+        vectorized_expansion._combine = recording_combine
+        try:
+            variants = numpy.arange(1, 1001, dtype = numpy.uint64)
+            parts = [(0, variants), (0, variants << numpy.uint64(20))]
+            with self.assertRaises(ExpansionError):
+                self.expand(parts, 5000)
+        finally:
+            vectorized_expansion._combine = combine
+
+        # A million combinations, never allocated at once
+        self.assertLessEqual(max(sizes), 5000)
+
+    def test_budget_blocks_same_order(self):
+        variants = numpy.array([1, 2, 3, 6, 4], dtype = numpy.uint64)
+        parts = [(0, variants), (0, variants), (1, numpy.array([2, 4], dtype = numpy.uint64))]
+        expected = self.expand(parts)
+        count = 5 + len(self.expand(parts[:2])) + len(expected)
+
+        # Only fits because of duplicates, so it's combined in blocks
+        self.assertLess(count, 5 + 25 + 2 * 7)
+        self.assertEqual(self.expand(parts, count), expected)
+        with self.assertRaises(ExpansionError):
+            self.expand(parts, count - 1)
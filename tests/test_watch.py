@@ -0,0 +1,127 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+
+from tests import DictionaryTestCase, TEST_DICT, load_test_dict
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from binary_dictionary import BinaryDictionary
+from mixin_library import MixinLibrary
+from watch import DictionaryWatcher, replace_atomically, write_atomically
+
+
+class DictionaryWatcherTest(DictionaryTestCase):
+    temporary_directory = True
+
+    def setUp(self):
+        super().setUp()
+        self.source_path = self.temp_path("source.json")
+        shutil.copy(TEST_DICT, self.source_path)
+
+    def test_write_atomically_mode(self):
+        umask = os.umask(0o022)
+        try:
+            write_atomically(self.temp_path("new.json"), "{}")
+            self.assertEqual(os.stat(self.temp_path("new.json")).st_mode & 0o777, 0o644)
+
+            os.chmod(self.temp_path("new.json"), 0o600)
+            write_atomically(self.temp_path("new.json"), "{}")
+            self.assertEqual(os.stat(self.temp_path("new.json")).st_mode & 0o777, 0o600)
+        finally:
+            os.umask(umask)
+
+        with open(self.temp_path("new.json")) as in_file:
+            self.assertEqual(in_file.read(), "{}")
+        # No temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.directory)),
+            ["new.json", "source.json"])
+
+    def test_replace_atomically_failure(self):
+        write_atomically(self.temp_path("new.json"), "{}")
+        for exception in (OSError, TypeError, KeyboardInterrupt):
+            def write(temporary_path):
+                with open(temporary_path, "w") as out_file:
+                    out_file.write("{")
+                raise exception()
+
+            with self.assertRaises(exception):
+                replace_atomically(self.temp_path("new.json"), write)
+
+            # The replaced file is kept and the temporary file is removed
+            with open(self.temp_path("new.json")) as in_file:
+                self.assertEqual(in_file.read(), "{}")
+            self.assertEqual(sorted(os.listdir(self.directory)),
+                ["new.json", "source.json"])
+
+    def test_build_outputs(self):
+        watcher = DictionaryWatcher(self.layout, self.source_path,
+            self.temp_path("output.json"),
+            build_cache_path = self.temp_path("cache.json"),
+            binary_output_path = self.temp_path("output.asdb"),
+            sqlite_output_path = self.temp_path("output.sqlite"),
+            mixin_library_output_path = self.temp_path("mixins.json"))
+        watcher.build()
+
+        expected = AdvancedStenoDictionary(self.layout)
+        expected.add_entries(load_test_dict())
+
+        with open(self.temp_path("output.json")) as output_file:
+            self.assertEqual(json.load(output_file), expected.entries)
+        self.assertTrue(os.path.exists(self.temp_path("cache.json")))
+
+        binary = BinaryDictionary(self.temp_path("output.asdb"))
+        self.assertEqual(dict(binary.items()), expected.entries)
+        binary.close()
+
+        connection = sqlite3.connect(self.temp_path("output.sqlite"))
+        self.assertEqual(dict(connection.execute(
+                "SELECT strokes, translation FROM entries")),
+            expected.entries)
+        connection.close()
+
+        library = MixinLibrary.load(self.temp_path("mixins.json"), self.layout)
+        self.assertEqual(library.version,
+            MixinLibrary.from_dictionary(expected).version)
+
+    def test_failed_builds(self):
+        watcher = DictionaryWatcher(self.layout, self.source_path,
+            self.temp_path("output.json"), poll_interval = 0.01, debounce = 0.0)
+        attempts = threading.Semaphore(0)
+        build = watcher.build
+        def counted_build(generation = None):
+            try:
+                build(generation)
+            finally:
+                attempts.release()
+        watcher.build = counted_build
+
+        mtime = os.stat(self.source_path).st_mtime_ns
+        def write_source(text):
+            nonlocal mtime
+            with open(self.source_path, "w") as source_file:
+                source_file.write(text)
+            mtime += 10 ** 9
+            os.utime(self.source_path, ns = (mtime, mtime))
+
+        # Malformed translation
+        write_source(json.dumps({"a]": "A"}))
+        thread = threading.Thread(target = watcher.watch)
+        thread.start()
+        try:
+            self.assertTrue(attempts.acquire(timeout = 5))
+            self.assertFalse(os.path.exists(self.temp_path("output.json")))
+
+            # Not an object
+            write_source("[1, 2]")
+            self.assertTrue(attempts.acquire(timeout = 5))
+            self.assertFalse(os.path.exists(self.temp_path("output.json")))
+
+            write_source(json.dumps({"nat": "TPHAT"}))
+            self.assertTrue(attempts.acquire(timeout = 5))
+        finally:
+            watcher.stop()
+            thread.join()
+
+        with open(self.temp_path("output.json")) as output_file:
+            self.assertEqual(json.load(output_file), {"TPHAT": "nat"})
@@ -1,4 +1,6 @@
 import re
+import threading
+from collections import OrderedDict
 
 
 def single_quote_str(string):
@@ -15,3 +17,57 @@ def double_quote_str(string):
 
 def unquote_str(string):
     return string[1:-1].replace("\\'", "'")
+
+
+# Thread safe, the lookup server's request threads share the key layout
+# caches with the rebuilding thread.
+#
+# If weight is given, max_size limits the total weight(value) of the cached
+# values instead of their number. Values heavier than max_size aren't cached.
+class LRUCache:
+    def __init__(self, max_size, weight = None):
+        self.max_size = max_size
+        self.weight = weight
+        self.items = OrderedDict()
+        # Total weight of the cached values
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default = None):
+        with self.lock:
+            try:
+                value = self.items[key]
+            except KeyError:
+                return default
+
+            self.items.move_to_end(key)
+            return value
+
+    def _weight(self, value):
+        return 1 if self.weight is None else self.weight(value)
+
+    def __setitem__(self, key, value):
+        weight = self._weight(value)
+
+        with self.lock:
+            if key in self.items:
+                self.size -= self._weight(self.items.pop(key))
+            if weight > self.max_size:
+                return
+
+            self.items[key] = value
+            self.size += weight
+
+            while self.size > self.max_size:
+                self.size -= self._weight(self.items.popitem(last = False)[1])
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
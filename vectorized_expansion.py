@@ -0,0 +1,76 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Expansions with fewer combinations than this (the product of the number
+# of variants of each part) are faster with the scalar expansion.
+min_combinations = 64
+
+def available():
+    return numpy is not None
+
+# Single stroke variants (tuples of stroke key bitmasks) as an array of
+# stroke key bitmasks, or None if NumPy isn't available or any variant has
+# more than one stroke.
+def single_stroke_array(variants_keys):
+    if numpy is None:
+        return None
+
+    strokes = []
+    for keys in variants_keys:
+        if len(keys) != 1:
+            return None
+        strokes.append(keys[0])
+
+    return numpy.array(strokes, dtype = numpy.uint64)
+
+# Distinct values in order of first occurrence.
+def _unique(values):
+    unique, first = numpy.unique(values, return_index = True)
+
+    return values[numpy.sort(first)]
+
+def _combine(action, level, variants):
+    if action == 0:
+        return level[:, None] | variants[None, :]
+    else:
+        return level[:, None] & ~variants[None, :]
+
+# Yields the distinct single stroke sequences of combining parts, a list of
+# (action, array of single stroke variants), in the same order as the depth
+# first expansion. Each part is combined with all the distinct partial
+# sequences of the previous parts at once.
+#
+# level_sizes has the number of distinct partial sequences after each part
+# appended to it as they're made, check(expansion count) is called after
+# each part. If combining a part could make more than max_expansion partial
+# sequences in total, it's combined a block of rows at a time instead and
+# check is called after each block, so the expansion is stopped before more
+# than the remaining budget is allocated.
+def iter_single_stroke_sequence_keys(parts, level_sizes, check, max_expansion = None):
+    level = numpy.zeros(1, dtype = numpy.uint64)
+    expansion_count = 0
+
+    for action, variants in parts:
+        if max_expansion is None \
+                or expansion_count + len(level) * len(variants) <= max_expansion:
+            level = _unique(_combine(action, level, variants).ravel())
+        else:
+            rows = max(1, (max_expansion - expansion_count) // len(variants))
+            combined = level[:0]
+            for start in range(0, len(level), rows):
+                block = _unique(
+                    _combine(action, level[start:start + rows], variants).ravel())
+                block = block[~numpy.isin(block, combined)]
+                combined = numpy.concatenate((combined, block))
+                check(expansion_count + len(combined))
+            level = combined
+
+        level_sizes.append(len(level))
+        expansion_count += len(level)
+        check(expansion_count)
+
+    for stroke_keys in level.tolist():
+        yield (stroke_keys,)
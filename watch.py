@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+
+from advanced_steno_dictionary import AdvancedStenoDictionary
+from build_cache import BuildCache
+from binary_dictionary import write_binary_dictionary
+from sqlite_dictionary import write_sqlite_dictionary
+from mixin_library import MixinLibrary
+
+
+class _BuildCancelled(Exception):
+    pass
+
+# Mode of new files, as if created with open().
+def _new_file_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+
+    return 0o666 & ~umask
+
+# Calls write(temporary path) and renames the temporary file over path, so
+# readers never see a partially written file. The file keeps the mode of the
+# file it replaces, or gets the mode of a new file.
+def replace_atomically(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+            dir = directory, prefix = ".", suffix = ".tmp",
+            delete = False) as out_file:
+        pass
+
+    replaced = False
+    try:
+        write(out_file.name)
+        if os.path.exists(path):
+            shutil.copymode(path, out_file.name)
+        else:
+            os.chmod(out_file.name, _new_file_mode())
+        os.replace(out_file.name, path)
+        replaced = True
+    finally:
+        if not replaced:
+            os.remove(out_file.name)
+
+def write_atomically(path, text):
+    def write(temporary_path):
+        with open(temporary_path, "w", encoding = "utf-8") as out_file:
+            out_file.write(text)
+
+    replace_atomically(path, write)
+
+# Rebuilds the output dictionary whenever the source file changes.
+#
+# The source is polled every poll_interval seconds and a build starts once it
+# hasn't changed for debounce seconds. Builds run in a background thread and
+# are abandoned if the source changes again before they finish. The build
+# cache is kept in memory between builds so only changed entries and entries
+# using changed mixins are re-expanded, and is saved to build_cache_path
+# after each build if given. The binary dictionary, SQLite dictionary and
+# mixin library are also written after each build if their paths are given.
+# A failed build is logged and the last written output is kept until the
+# source changes again.
+class DictionaryWatcher:
+    def __init__(self,
+        key_layout,
+        source_path,
+        output_path,
+        build_cache = None,
+        build_cache_path = None,
+        mixin_library = None,
+        max_expansion = None,
+        vectorized_expansion = False,
+        poll_interval = 0.2,
+        debounce = 0.3,
+        binary_output_path = None,
+        sqlite_output_path = None,
+        mixin_library_output_path = None
+    ):
+        self.key_layout = key_layout
+        self.source_path = source_path
+        self.output_path = output_path
+        self.build_cache = build_cache if build_cache is not None \
+            else BuildCache(key_layout)
+        self.build_cache_path = build_cache_path
+        self.mixin_library = mixin_library
+        self.max_expansion = max_expansion
+        self.vectorized_expansion = vectorized_expansion
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.binary_output_path = binary_output_path
+        self.sqlite_output_path = sqlite_output_path
+        self.mixin_library_output_path = mixin_library_output_path
+
+        # Last completed build
+        self.dictionary = None
+
+        self.source_mtime = None
+        # Incremented for every source change, builds of older generations
+        # are cancelled.
+        self.generation = 0
+        self.change_time = 0.0
+        self.condition = threading.Condition()
+        # Set to stop watch
+        self.stopped = threading.Event()
+
+    def _changed(self):
+        with self.condition:
+            self.generation += 1
+            self.change_time = time.monotonic()
+            self.condition.notify()
+
+    def _check_cancelled(self, generation):
+        if self.generation != generation:
+            raise _BuildCancelled()
+
+    def build(self, generation = None):
+        if generation is None:
+            generation = self.generation
+        start = time.perf_counter()
+
+        with open(self.source_path) as data_file:
+            entries = json.load(data_file, object_pairs_hook=tuple)
+
+        dictionary = AdvancedStenoDictionary(self.key_layout)
+        if self.mixin_library is not None:
+            self.mixin_library.apply(dictionary)
+        dictionary.max_expansion = self.max_expansion
+        dictionary.vectorized_expansion = self.vectorized_expansion
+        if self.sqlite_output_path is not None:
+            dictionary.entry_sources = {}
+
+        for translation_str, ss_str, key_str, simple_translation \
+                in dictionary.generate_entries(entries, self.build_cache):
+            self._check_cancelled(generation)
+
+            if key_str in dictionary.entries:
+                dictionary.log_entry_conflict(translation_str, ss_str,
+                    key_str, dictionary.entries[key_str])
+            dictionary.entries[key_str] = simple_translation
+            if dictionary.entry_sources is not None:
+                dictionary.entry_sources[key_str] = (translation_str, ss_str)
+        self._check_cancelled(generation)
+        self.build_cache.prune()
+
+        write_atomically(self.output_path,
+            json.dumps(dictionary.entries,
+                ensure_ascii = False, sort_keys = True,
+                indent = 0, separators = (',', ': ')))
+        if self.build_cache_path is not None:
+            self.build_cache.save(self.build_cache_path)
+        if self.binary_output_path is not None:
+            replace_atomically(self.binary_output_path,
+                lambda path: write_binary_dictionary(
+                    path, self.key_layout, dictionary.entries))
+        if self.sqlite_output_path is not None:
+            write_sqlite_dictionary(self.sqlite_output_path, dictionary)
+        if self.mixin_library_output_path is not None:
+            library = MixinLibrary.from_dictionary(dictionary)
+            replace_atomically(self.mixin_library_output_path, library.save)
+        self.dictionary = dictionary
+
+        print("Wrote " + str(len(dictionary.entries)) + " entries to "
+            + self.output_path + " in %.2fs" % (time.perf_counter() - start),
+            file = sys.stderr)
+
+    def _build_worker(self):
+        built_generation = 0
+        while True:
+            with self.condition:
+                while self.generation == built_generation:
+                    if self.stopped.is_set():
+                        return
+                    self.condition.wait()
+
+                # Wait for the source to stop changing
+                while True:
+                    remaining = self.change_time + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                generation = self.generation
+
+            try:
+                self.build(generation)
+            except _BuildCancelled:
+                pass
+            except Exception as e:
+                logging.warning("Error building " + self.source_path
+                    + ": " + type(e).__name__ + ": " + str(e))
+            built_generation = generation
+
+    def watch(self):
+        worker = threading.Thread(target = self._build_worker, daemon = True)
+        worker.start()
+
+        while not self.stopped.is_set():
+            try:
+                mtime = os.stat(self.source_path).st_mtime_ns
+            except OSError:
+                mtime = None
+
+            if mtime != self.source_mtime:
+                self.source_mtime = mtime
+                if mtime is not None:
+                    self._changed()
+
+            self.stopped.wait(self.poll_interval)
+
+        worker.join()
+
+    def stop(self):
+        with self.condition:
+            self.stopped.set()
+            self.condition.notify()